@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+
+from api.ImagePCA import ImagePCA
+
+
+class ImageCascade:
+    """
+    Pencarian bertingkat dengan dua model ImagePCA di atas gambar yang sama:
+    1. Model coarse (resolusi rendah, sedikit komponen) membuat shortlist dari seluruh gambar
+    2. Model fine (resolusi tinggi) hanya me-rerank gambar di shortlist
+
+    Kedua model dibuat dan di-cache oleh ImageModelStore.getCascade().
+
+    Contoh:
+    ```python
+    cascade = store.getCascade("api/uploads/images", (32, 32, 8), (100, 100, 10))
+    with open(query_path, "rb") as f:
+        similar_images = cascade.findSimilarImages(f.read(), k=10, shortlist=200)
+    print([cascade.filenames[x[0]] for x in similar_images])
+    ```
+    """
+
+    def __init__(self, coarse, fine):
+        self.coarse = coarse
+        self.fine = fine
+        self.filenames = fine.filenames
+        self.n_rows = (coarse.n_samples, fine.n_samples)
+        # Baris di fine.Z untuk setiap baris di coarse.Z (urutan bisa beda setelah partialFit)
+        if coarse.filenames == fine.filenames:
+            self.coarse_to_fine = None
+        else:
+            fine_rows = {filename: i for i, filename in enumerate(fine.filenames)}
+            self.coarse_to_fine = np.array([fine_rows.get(filename, -1) for filename in coarse.filenames])
+
+    def preprocessQueryImage(self, content):
+        """
+        Decodes the query once per model, so both use the same reduced-size decode
+        as their dataset
+
+        Returns:
+        (coarse_query, fine_query), the query image standardized for both models
+        """
+        coarse_query = ImagePCA.preprocessImageBytes(content, self.coarse.width, self.coarse.height) - self.coarse.X_mean_array
+        fine_query = ImagePCA.preprocessImageBytes(content, self.fine.width, self.fine.height) - self.fine.X_mean_array
+        return coarse_query, fine_query
+
+    def findSimilarImages(self, content, k, shortlist=200):
+        """
+        Parameters:
+        content: The encoded query image (file content)
+        k: The number of most similar images to return
+        shortlist: The number of candidates from the coarse model that the fine model reranks
+
+        Returns:
+        A list of (index, euclidean_distance, similarity) like ImagePCA.findSimilarImages,
+        index refers to self.filenames and the distance to the fine model
+        """
+        coarse_query, fine_query = self.preprocessQueryImage(content)
+        return self.findSimilarQuery(coarse_query, fine_query, k, shortlist)
+
+    def findSimilarQuery(self, coarse_query, fine_query, k, shortlist=200):
+        """
+        findSimilarImages for a query already standardized by preprocessQueryImage.
+        Similarities are normalized like ImagePCA.findSimilarImages on the fine model,
+        so an image scores the same as with the exact search
+        """
+        start = time.time()
+        coarse_Z = ImagePCA.projectToPrincipalComponents(coarse_query, self.coarse.U).astype(np.float32)
+        candidates = ImagePCA.topK(ImagePCA.euclideanDistances(coarse_Z, self.coarse.Z), max(shortlist, k))
+        if self.coarse_to_fine is not None:
+            candidates = self.coarse_to_fine[candidates]
+            candidates = candidates[candidates >= 0]
+
+        fine_Z = ImagePCA.projectToPrincipalComponents(fine_query, self.fine.U).astype(np.float32)
+        distances = ImagePCA.euclideanDistances(fine_Z, self.fine.Z[candidates])
+        top = ImagePCA.topK(distances, k)
+
+        dmean = self.fine.estimateMeanDistance(fine_Z)
+        result = [
+            (int(candidates[i]), float(distances[i]), 1 / (1 + float(distances[i]) / dmean) if dmean > 0 else 1.0)
+            for i in top
+        ]
+        end = time.time()
+        print("Time to find similar images (cascade): ", end - start)
+        return result
@@ -0,0 +1,161 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class KDTreeIndex:
+    """
+    Index exact di ruang PCA memakai scipy cKDTree.
+
+    Knob recall/latency: eps. eps=0 memberi hasil exact; eps > 0 mengizinkan
+    jarak hasil sampai (1 + eps) kali jarak tetangga sebenarnya, lebih cepat.
+    Tree tidak disimpan ke disk, cukup dibangun ulang dari Z saat model di-load.
+    Setelah partialFit tree hanya ditandai usang dan dibangun ulang dari Z pada
+    search berikutnya, jadi ingest beberapa batch hanya membangun tree sekali.
+    """
+
+    name = "kdtree"
+
+    def __init__(self, Z):
+        self.tree = cKDTree(Z)
+
+    def search(self, Z, query_Z, k, eps=0.0, **kwargs):
+        """
+        Returns:
+        (indices, distances) of the k nearest rows of Z, sorted by distance
+        """
+        k = min(k, Z.shape[0])
+        tree = self.tree
+        if tree is None:
+            tree = self.tree = cKDTree(Z)
+        distances, indices = tree.query(query_Z, k=k, eps=eps)
+        return np.atleast_1d(indices), np.atleast_1d(distances).astype(np.float32)
+
+    def update(self, Z, rotation, shift, n_old):
+        # Tree tidak bisa di-update, dibangun ulang dari Z yang baru saat dipakai
+        self.tree = None
+
+    def toArrays(self):
+        return {}
+
+    @staticmethod
+    def fromArrays(Z, arrays):
+        return KDTreeIndex(Z)
+
+
+class IVFIndex:
+    """
+    Index approximate (inverted file): Z dikelompokkan dengan k-means menjadi
+    n_lists cluster, query hanya memeriksa gambar di nprobe cluster terdekat.
+
+    Knob recall/latency: nprobe. nprobe = n_lists sama dengan pencarian exact.
+    """
+
+    name = "ivf"
+    CHUNK_SIZE = 65536
+
+    def __init__(self, centroids, assignments):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.setAssignments(assignments)
+
+    @staticmethod
+    def build(Z, n_lists=None, n_iter=10, sample_size=256, seed=0):
+        """
+        Returns:
+        An IVFIndex trained with k-means on (a sample of) Z
+        """
+        N = Z.shape[0]
+        if n_lists is None:
+            n_lists = int(np.sqrt(N))
+        n_lists = max(1, min(n_lists, N, 4096))
+
+        rng = np.random.default_rng(seed)
+        n_train = min(N, n_lists * sample_size)
+        train = Z[np.sort(rng.choice(N, n_train, replace=False))]
+        centroids = train[rng.choice(n_train, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = IVFIndex.assign(centroids, train)
+            counts = np.bincount(labels, minlength=n_lists)
+            nonempty = counts > 0
+            for d in range(centroids.shape[1]):
+                sums = np.bincount(labels, weights=train[:, d], minlength=n_lists)
+                centroids[nonempty, d] = sums[nonempty] / counts[nonempty]
+
+        return IVFIndex(centroids, IVFIndex.assign(centroids, Z))
+
+    @staticmethod
+    def assign(centroids, Z):
+        """
+        Returns:
+        The index of the nearest centroid of every row of Z
+        """
+        c_sq = np.einsum('ij,ij->i', centroids, centroids)
+        labels = np.empty(Z.shape[0], dtype=np.int64)
+        for start in range(0, Z.shape[0], IVFIndex.CHUNK_SIZE):
+            rows = Z[start:start + IVFIndex.CHUNK_SIZE]
+            labels[start:start + len(rows)] = np.argmin(c_sq[None, :] - 2 * (rows @ centroids.T), axis=1)
+        return labels
+
+    def setAssignments(self, assignments):
+        # Simpan list per cluster dalam bentuk CSR: order diurutkan per cluster, offsets batasnya
+        self.assignments = np.asarray(assignments, dtype=np.int64)
+        self.order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def search(self, Z, query_Z, k, nprobe=8, **kwargs):
+        """
+        Returns:
+        (indices, distances) of the k nearest rows of Z found in the nprobe
+        nearest clusters, sorted by distance
+        """
+        k = min(k, Z.shape[0])
+        centroid_distances = np.einsum('ij,ij->i', self.centroids - query_Z, self.centroids - query_Z)
+        probe_order = np.argsort(centroid_distances)
+        sizes = self.offsets[probe_order + 1] - self.offsets[probe_order]
+        # Periksa cluster tambahan kalau nprobe cluster belum berisi k gambar
+        nprobe = max(min(nprobe, len(probe_order)), int(np.searchsorted(np.cumsum(sizes), k)) + 1)
+        probes = probe_order[:nprobe]
+
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+        diff = Z[candidates] - query_Z
+        distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        if k < len(candidates):
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(distances[top], kind='stable')]
+        return candidates[top], distances[top]
+
+    def update(self, Z, rotation, shift, n_old):
+        """
+        Follows an incremental update of Z: old points keep their cluster (the
+        centroids get the same affine map as Z) and new points are assigned
+        """
+        self.centroids = np.ascontiguousarray(self.centroids @ rotation + shift, dtype=np.float32)
+        new_assignments = IVFIndex.assign(self.centroids, Z[n_old:])
+        self.setAssignments(np.concatenate((self.assignments[:n_old], new_assignments)))
+
+    def toArrays(self):
+        return {"centroids": self.centroids, "assignments": self.assignments}
+
+    @staticmethod
+    def fromArrays(Z, arrays):
+        return IVFIndex(arrays["centroids"], arrays["assignments"])
+
+
+INDEX_TYPES = {
+    KDTreeIndex.name: KDTreeIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def buildIndex(kind, Z, **params):
+    """
+    Returns:
+    A new index of the given kind ("kdtree" or "ivf") over the projections Z
+    """
+    if kind == KDTreeIndex.name:
+        return KDTreeIndex(Z)
+    if kind == IVFIndex.name:
+        return IVFIndex.build(Z, **params)
+    raise ValueError(f'Unknown index: {kind}')
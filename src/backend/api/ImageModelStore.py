@@ -0,0 +1,313 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from api.ImagePCA import ImagePCA
+from api.ImageCascade import ImageCascade
+from api.executor import ExecutorSaturated
+
+
+class ImageModelStore:
+    """
+    Menyimpan model ImagePCA yang sudah di-fit, di memory dan di disk.
+
+    Model di-key dengan (width, height, k_components) dan diberi fingerprint dari
+    direktori gambar (nama, ukuran, mtime file). Selama fingerprint sama, query
+    cukup memakai model yang sudah ada; fit ulang hanya terjadi kalau dataset berubah.
+    Fingerprint di-cache dan hanya dihitung ulang kalau mtime direktori berubah atau
+    setelah invalidateFingerprints(), jadi query tidak perlu memindai seluruh direktori.
+
+    Gambar yang baru di-upload dimasukkan lewat ingest() dengan incremental PCA.
+    Selama upload berjalan (ingesting()), get() tetap memakai model yang ada walaupun
+    direktori sudah berubah, sampai ingest() mengganti model dengan versi barunya.
+    Kalau drift model melewati drift_threshold, fit ulang penuh dijalankan di
+    background (di executor kalau diberikan, lihat BoundedExecutor.spawn) dan model
+    diganti setelah selesai.
+
+    Setiap model yang di-fit juga dibangun index nearest-neighbour-nya (lihat
+    api/ImageIndex.py) sesuai parameter indexes; index ikut disimpan bersama model.
+
+    Dengan use_mmap=True, matrix gambar saat fit ditulis ke file .npy di model_dir
+    (memory-mapped) sehingga dataset besar tidak perlu dimuat seluruhnya ke RAM.
+    Dengan streaming=True, model di-fit chunk per chunk langsung dari file gambar
+    (ImagePCA.fitStreaming), matrix gambar tidak pernah dibuat.
+
+    Contoh:
+    ```python
+    store = ImageModelStore("api/models")
+    store.load()  # reload model dari disk saat startup
+
+    pca = store.get("api/uploads/images", 100, 100)
+    query_img = pca.preprocessQueryImage(img, 100, 100)
+    similar_images = pca.findSimilarImages(query_img, None, 5)
+    print([pca.filenames[x[0]] for x in similar_images])
+
+    with store.ingesting("api/uploads/images"):
+        store.ingest("api/uploads/images", ["api/uploads/images/new.jpg"])
+    ```
+    """
+
+    def __init__(self, model_dir, drift_threshold=0.1, ingest_batch_size=64, use_mmap=False, solver="auto", indexes=("kdtree", "ivf"), streaming=False, executor=None):
+        self.model_dir = model_dir
+        self.executor = executor
+        self.streaming = streaming
+        self.indexes = indexes
+        self.solver = solver
+        self.use_mmap = use_mmap
+        self.drift_threshold = drift_threshold
+        self.ingest_batch_size = ingest_batch_size
+        self.models = {}
+        self.cascades = {}
+        self.refitting = set()
+        self.fingerprints = {}
+        # Number of uploads writing into each image directory
+        self.ingests = {}
+        self.lock = threading.Lock()
+        os.makedirs(model_dir, exist_ok=True)
+
+    def modelPath(self, width, height, k_components):
+        return os.path.join(self.model_dir, f"pca_{width}x{height}_k{k_components}.npz")
+
+    def load(self):
+        """
+        Loads every model saved in model_dir into memory
+        """
+        for filename in os.listdir(self.model_dir):
+            if not (filename.startswith("pca_") and filename.endswith(".npz")):
+                continue
+            try:
+                pca = ImagePCA.load(os.path.join(self.model_dir, filename))
+            except Exception as e:
+                print(f"Failed to load model {filename}: {e}")
+                continue
+            self.models[(pca.width, pca.height, pca.k_components)] = pca
+
+    def fingerprint(self, image_dir, width=100, height=100, k_components=10):
+        """
+        Returns:
+        ImagePCA.computeFingerprint of image_dir, cached until the directory mtime
+        changes or invalidateFingerprints() is called, so a query costs one stat
+        instead of a walk over every image
+        """
+        cache_key = (image_dir, width, height, k_components)
+        try:
+            dir_mtime = os.stat(image_dir).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = None
+        cached = self.fingerprints.get(cache_key)
+        if cached is not None and cached[0] == dir_mtime:
+            return cached[1]
+        # The mtime is read before the walk, a file added meanwhile changes it again
+        fingerprint = ImagePCA.computeFingerprint(image_dir, width, height, k_components)
+        self.fingerprints[cache_key] = (dir_mtime, fingerprint)
+        return fingerprint
+
+    def invalidateFingerprints(self):
+        """
+        Drops the cached fingerprints, called whenever the image directory is written to
+        """
+        self.fingerprints.clear()
+
+    @contextmanager
+    def ingesting(self, image_dir):
+        """
+        Marks an upload into image_dir as running: until the block exits get() keeps
+        serving the loaded models instead of refitting on the half-written directory
+        """
+        with self.lock:
+            self.ingests[image_dir] = self.ingests.get(image_dir, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.ingests[image_dir] -= 1
+                if not self.ingests[image_dir]:
+                    del self.ingests[image_dir]
+
+    def get(self, image_dir, width=100, height=100, k_components=10):
+        """
+        Returns:
+        A fitted ImagePCA for the images in image_dir, or None if there are no images.
+        Only refits when the fingerprint of image_dir has changed and no upload into
+        image_dir is running.
+        """
+        key = (width, height, k_components)
+        pca = self.models.get(key)
+        if pca is not None and image_dir in self.ingests:
+            return pca
+        fingerprint = self.fingerprint(image_dir, width, height, k_components)
+        if pca is not None and pca.fingerprint == fingerprint:
+            return pca
+
+        with self.lock:
+            pca = self.models.get(key)
+            if pca is not None and image_dir in self.ingests:
+                return pca
+            fingerprint = self.fingerprint(image_dir, width, height, k_components)
+            if pca is not None and pca.fingerprint == fingerprint:
+                return pca
+
+            model_path = self.modelPath(width, height, k_components)
+            if os.path.exists(model_path):
+                try:
+                    pca = ImagePCA.load(model_path)
+                except Exception as e:
+                    print(f"Failed to load model {model_path}: {e}")
+                    pca = None
+                if pca is not None and pca.fingerprint == fingerprint:
+                    self.models[key] = pca
+                    return pca
+
+            pca = self.fit(image_dir, width, height, k_components)
+            if pca is None:
+                self.models.pop(key, None)
+                return None
+            pca.fingerprint = fingerprint
+            pca.save(model_path)
+            self.models[key] = pca
+            return pca
+
+    def getCascade(self, image_dir, coarse=(32, 32, 8), fine=(100, 100, 10)):
+        """
+        Returns:
+        An ImageCascade over the coarse and fine models, each given as
+        (width, height, k_components), or None if there are no images.
+        Both models are cached side by side like any other model.
+        """
+        coarse_pca = self.get(image_dir, *coarse)
+        fine_pca = self.get(image_dir, *fine)
+        if coarse_pca is None or fine_pca is None:
+            return None
+        cascade = self.cascades.get((coarse, fine))
+        if (cascade is None or cascade.coarse is not coarse_pca or cascade.fine is not fine_pca
+                or cascade.n_rows != (coarse_pca.n_samples, fine_pca.n_samples)):
+            cascade = ImageCascade(coarse_pca, fine_pca)
+            self.cascades[(coarse, fine)] = cascade
+        return cascade
+
+    def preprocessSizes(self):
+        """
+        Returns:
+        The (width, height) of every loaded model, the sizes newly uploaded images
+        can be preprocessed at before ingest()
+        """
+        with self.lock:
+            return sorted({(width, height) for width, height, _ in self.models})
+
+    def ingest(self, image_dir, image_paths, preprocessed=None):
+        """
+        Adds newly uploaded images to every loaded model with ImagePCA.partialFit,
+        in batches of ingest_batch_size. Models whose image set changed in other
+        ways (deleted or overwritten files), or with an image that fails to decode,
+        are left stale and refit by get().
+        The batches are folded into a copy of the model which replaces it once
+        done, queries running meanwhile keep a consistent model.
+
+        preprocessed optionally maps (width, height) to {image_path: preprocessed image}
+        for images already decoded during the upload; other images are read from disk.
+        """
+        new_filenames = [os.path.basename(p) for p in image_paths]
+        with self.lock:
+            _, filenames = ImagePCA.listImagePaths(image_dir)
+            for key, pca in list(self.models.items()):
+                width, height, k_components = key
+                known = set(pca.filenames)
+                if known.intersection(new_filenames) or set(filenames) != known.union(new_filenames):
+                    continue
+
+                pca = pca.copy()
+                ready = (preprocessed or {}).get((width, height), {})
+                try:
+                    for i in range(0, len(image_paths), self.ingest_batch_size):
+                        batch_paths = image_paths[i:i + self.ingest_batch_size]
+                        batch_images = [ready[p] if p in ready else ImagePCA.processImagePath(p, width, height) for p in batch_paths]
+                        pca.partialFit(batch_images, new_filenames[i:i + self.ingest_batch_size])
+                except (OSError, ValueError) as e:
+                    # The copy is dropped, the model stays stale and get() refits it
+                    print(f"Failed to ingest images into model {key}: {e}")
+                    continue
+
+                pca.fingerprint = self.fingerprint(image_dir, width, height, k_components)
+                pca.save(self.modelPath(width, height, k_components))
+                self.models[key] = pca
+
+                if pca.drift > self.drift_threshold:
+                    self.refitInBackground(image_dir, key)
+
+    def refitInBackground(self, image_dir, key):
+        """
+        Starts a full refit of the model for key on the executor (a thread when it is
+        not running). The current model keeps serving queries until the new one is ready.
+        A refit rejected by a saturated executor is retried after the next ingest.
+        """
+        if key in self.refitting:
+            return
+        self.refitting.add(key)
+        # ingest() holds the lock, so the refit never runs in the calling thread
+        if self.executor is None or not self.executor.running:
+            threading.Thread(target=self._refit, args=(image_dir, key), daemon=True).start()
+            return
+        try:
+            self.executor.spawn(self._refit, image_dir, key)
+        except ExecutorSaturated:
+            print(f"Background refit of model {key} postponed, {self.executor.name} executor is saturated")
+            self.refitting.discard(key)
+
+    def _refit(self, image_dir, key):
+        width, height, k_components = key
+        try:
+            fingerprint = ImagePCA.computeFingerprint(image_dir, width, height, k_components)
+            pca = self.fit(image_dir, width, height, k_components)
+            with self.lock:
+                # Drop the result if the images changed while fitting
+                if pca is None or fingerprint != ImagePCA.computeFingerprint(image_dir, width, height, k_components):
+                    return
+                pca.fingerprint = fingerprint
+                pca.save(self.modelPath(width, height, k_components))
+                self.models[key] = pca
+        except Exception as e:
+            print(f"Background refit failed: {e}")
+        finally:
+            self.refitting.discard(key)
+
+    def fit(self, image_dir, width, height, k_components):
+        start = time.time()
+        if self.streaming:
+            image_paths, filenames = ImagePCA.listImagePaths(image_dir)
+            if not filenames:
+                return None
+            pca = ImagePCA()
+            pca.fitStreaming(lambda: ImagePCA.iterImageChunks(image_paths, width, height), k_components, D=width * height)
+            return self.finishFit(pca, filenames, width, height, start)
+
+        mmap_path = os.path.join(self.model_dir, f"images_{width}x{height}.npy") if self.use_mmap else None
+        prep_images, mean_array, filenames = ImagePCA.loadAndPreprocessData(image_dir, width, height, mmap_path=mmap_path)
+        if not filenames:
+            return None
+
+        pca = ImagePCA()
+        pca.fit(prep_images, mean_array, k_components, solver=self.solver)
+        return self.finishFit(pca, filenames, width, height, start)
+
+    def finishFit(self, pca, filenames, width, height, start):
+        pca.filenames = filenames
+        pca.width = width
+        pca.height = height
+        for kind in self.indexes:
+            pca.buildIndex(kind)
+        end = time.time()
+        print("Time to build image model: ", end - start)
+        return pca
+
+    def clear(self):
+        """
+        Drops every model from memory and disk
+        """
+        with self.lock:
+            self.models.clear()
+            self.cascades.clear()
+            self.fingerprints.clear()
+            for filename in os.listdir(self.model_dir):
+                if filename.endswith((".npz", ".npy")):
+                    os.remove(os.path.join(self.model_dir, filename))
@@ -1,9 +1,16 @@
 from PIL import Image
 import numpy as np
+import scipy.linalg as sla
 import scipy.sparse.linalg as splg
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import copy
+import tempfile
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from api.ImageIndex import INDEX_TYPES, buildIndex
 
 
 class ImagePCA:
@@ -27,6 +34,8 @@ class ImagePCA:
     width = 100
     height = 100
     prep_images, mean_array, filenames = ImagePCA.loadAndPreprocessData(path, width, height)
+    # Untuk dataset besar: ImagePCA.loadAndPreprocessData(path, width, height, mmap_path="images.npy")
+    # lalu buka lagi dengan ImagePCA.openMatrix("images.npy")
 
     pca = ImagePCA()
     pca.fit(prep_images, mean_array)
@@ -45,12 +54,38 @@ class ImagePCA:
     - Pastikan library sudah terinstall
     - X_mean_array adalah mean dari setiap pixel yang di-precompute pada tahap preprocessing
     - U adalah matrix dari k principal components yang dihitung dari SVD
+    - Z adalah proyeksi dataset ke principal components (matrix N x k float32), di-precompute saat fit
+    - Model yang sudah di-fit bisa disimpan dengan save() dan dibuka lagi dengan load()
+    - Gambar baru bisa ditambahkan tanpa fit ulang dengan partialFit(); drift mengukur
+      seberapa jauh data baru menyimpang dari basis hasil fit terakhir
+    - fit(..., solver=...) memilih cara menghitung SVD: "arpack" (svds), "randomized"
+      (randomized SVD dengan power iteration), "gram" (eigendecomposition matrix N x N,
+      cepat kalau N jauh lebih kecil dari D), atau "auto"
+    - fitStreaming(chunks) mem-fit model chunk per chunk (covariance atau incremental SVD)
+      untuk dataset yang lebih besar dari RAM
+    - buildIndex("kdtree") / buildIndex("ivf") membangun index nearest-neighbour di atas Z,
+      lalu findSimilarImages(..., method="ivf", nprobe=8) tidak perlu scan semua gambar
     """
     
+    IMAGE_EXTENSIONS = ('.jpeg', '.jpg', '.png')
+    CHUNK_SIZE = 4096
+
     def __init__(self):
         self.U = None
         self.S = None
         self.X_mean_array = None
+        self.Z = None
+        self.filenames = None
+        self.width = None
+        self.height = None
+        self.k_components = None
+        self.fingerprint = None
+        self.n_samples = 0
+        self.total_variance = 0.0
+        self.drift = 0.0
+        self.n_incremental = 0
+        self.fit_info = {}
+        self.indexes = {}
         self.fit_done = False
         
     @staticmethod
@@ -67,35 +102,127 @@ class ImagePCA:
         return images
     
     @staticmethod
-    def loadAndPreprocessData(path, width=100, height=100, batch_size=os.cpu_count()//2):
+    def listImagePaths(path):
+        """
+        Returns:
+        (image_paths, filenames) of every image under path, sorted by path so
+        the order is stable between calls
+        """
+        image_paths = []
+        for root, dirs, files in os.walk(path):
+            for filename in files:
+                if filename.endswith(ImagePCA.IMAGE_EXTENSIONS):
+                    image_paths.append(os.path.join(root, filename))
+        image_paths.sort()
+        filenames = [os.path.basename(p) for p in image_paths]
+        return image_paths, filenames
+
+    @staticmethod
+    def computeFingerprint(path, width=100, height=100, k_components=10):
+        """
+        Returns:
+        A hex digest of the image set under path (names, sizes, mtimes) and the
+        model parameters. Changes whenever the model has to be refit.
+        """
+        image_paths, _ = ImagePCA.listImagePaths(path)
+        h = hashlib.sha1(f"{width}x{height}:k{k_components}".encode())
+        for image_path in image_paths:
+            st = os.stat(image_path)
+            h.update(f"\0{os.path.relpath(image_path, path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+        return h.hexdigest()
+
+    # Di bawah jumlah ini gambar diproses di process utama (overhead spawn process lebih mahal)
+    MIN_IMAGES_PER_WORKER = 64
+    last_load_stats = {}
+
+    @staticmethod
+    def loadAndPreprocessData(path, width=100, height=100, batch_size=64, mmap_path=None, dtype=np.float32, workers=None):
         """
+        Args:
+        batch_size: Number of images decoded per worker task
+        mmap_path: If given, the image matrix is written to this .npy file and returned memory-mapped
+        dtype: np.float32 (standardized in place) or np.uint8 (raw pixels, standardized on the fly)
+        workers: Number of worker processes, None for os.cpu_count(), 0 or 1 to decode in this process
+
         Returns:
         A tuple containing:
-        - A list of standardized images as numpy arrays
+        - A N x D matrix of standardized images, one image per row
         - The mean array
         - A list of image filenames
         """
         start = time.time()
-        images = []
-        image_paths = []
-        filenames = []
+        image_paths, filenames = ImagePCA.listImagePaths(path)
+        N = len(image_paths)
+        D = width * height
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, N // ImagePCA.MIN_IMAGES_PER_WORKER)
 
-        for root, dirs, files in os.walk(path):
-            for filename in files:
-                if filename.endswith('.jpeg') or filename.endswith('.jpg') or filename.endswith('.png'):
-                    image_paths.append(os.path.join(root, filename))
-                    filenames.append(filename)
+        if workers <= 1:
+            X = ImagePCA.allocateImageMatrix(N, D, dtype, mmap_path)
+            for i, image_path in enumerate(image_paths):
+                X[i] = ImagePCA.processImagePath(image_path, width, height)
+        else:
+            # Workers write straight into a shared .npy file: mmap_path itself, or a
+            # temporary uint8 file that is copied into memory afterwards
+            if mmap_path is not None:
+                shared_path, shared_dtype = mmap_path, dtype
+            else:
+                fd, shared_path = tempfile.mkstemp(suffix='.npy')
+                os.close(fd)
+                shared_dtype = np.uint8
+            try:
+                shared = ImagePCA.allocateImageMatrix(N, D, shared_dtype, shared_path)
+                del shared
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    tasks = [
+                        executor.submit(ImagePCA.processImageChunk, shared_path, i, image_paths[i:i + batch_size], width, height)
+                        for i in range(0, N, batch_size)
+                    ]
+                    for task in tasks:
+                        task.result()
 
-        with ThreadPoolExecutor() as executor:
-            for i in range(0, len(image_paths), batch_size):
-                batch_paths = image_paths[i:i + batch_size]
-                batch_images = list(executor.map(ImagePCA.processImagePath, batch_paths, [width]*len(batch_paths), [height]*len(batch_paths)))
-                images.extend(batch_images)
+                if mmap_path is not None:
+                    X = np.load(mmap_path, mmap_mode='r+')
+                else:
+                    shared = np.load(shared_path, mmap_mode='r')
+                    X = ImagePCA.allocateImageMatrix(N, D, dtype)
+                    for chunk_start, chunk_stop in ImagePCA.chunkRanges(N):
+                        X[chunk_start:chunk_stop] = shared[chunk_start:chunk_stop]
+                    del shared
+            finally:
+                if mmap_path is None:
+                    os.remove(shared_path)
+        decode_time = time.time() - start
 
-        std_images, mean_array = ImagePCA.stadardizeGrayImages(images)
+        mean_array = ImagePCA.standardizeInPlace(X)
+        if mmap_path is not None:
+            X.flush()
+            np.save(ImagePCA.meanPath(mmap_path), mean_array)
         end = time.time()
+        ImagePCA.last_load_stats = {
+            "images": N,
+            "workers": max(workers, 1),
+            "decode_time": decode_time,
+            "time": end - start,
+            "images_per_sec": N / decode_time if decode_time > 0 else 0.0,
+        }
         print("Time to load and preprocess images: ", end - start)
-        return (std_images, mean_array, filenames)
+        print(f"Decoded {N} images with {max(workers, 1)} worker(s): {ImagePCA.last_load_stats['images_per_sec']:.1f} images/sec")
+        return (X, mean_array, filenames)
+
+    @staticmethod
+    def processImageChunk(shared_path, start, image_paths, width, height):
+        """
+        Worker task: preprocesses image_paths and writes them to rows start.. of the
+        shared .npy matrix at shared_path
+        """
+        X = np.load(shared_path, mmap_mode='r+')
+        for i, image_path in enumerate(image_paths):
+            X[start + i] = ImagePCA.processImagePath(image_path, width, height)
+        X.flush()
+        del X
+        return len(image_paths)
     
     @staticmethod
     def processImagePath(image_path, width, height):
@@ -124,31 +251,108 @@ class ImagePCA:
         images1D: A non-empty list of 1D images as numpy array of same length
         
         Returns:
-        (std_images, mean_array)
+        (std_images, mean_array), std_images is a N x D float32 matrix
         """
         start = time.time()
         N = len(images_array_1d)
-        std_images = []
-
-        images_array_1d_np = np.array([img.astype(np.float32) for img in images_array_1d])
-        
-        mean_array = np.mean(images_array_1d_np, axis=0)
-        
-        for i in range(N):
-            std_images.append(images_array_1d_np[i] - mean_array)
+        X = ImagePCA.allocateImageMatrix(N, len(images_array_1d[0]))
+        for i, img in enumerate(images_array_1d):
+            X[i] = img
+        mean_array = ImagePCA.standardizeInPlace(X)
         end = time.time()
         print("Time to standardize images: ", end - start)
         
-        return (std_images, mean_array)
+        return (X, mean_array)
+
+    @staticmethod
+    def allocateImageMatrix(N, D, dtype=np.float32, mmap_path=None):
+        """
+        Returns:
+        An uninitialized N x D matrix, memory-mapped to mmap_path (.npy) if given
+        """
+        if mmap_path is not None:
+            return np.lib.format.open_memmap(mmap_path, mode='w+', dtype=dtype, shape=(N, D))
+        return np.empty((N, D), dtype=dtype)
+
+    @staticmethod
+    def isStandardized(X):
+        """
+        Returns:
+        False if X holds raw uint8 pixels that still need the mean subtracted
+        """
+        return X.dtype.kind == 'f'
+
+    @staticmethod
+    def chunkRanges(N, chunk_size=CHUNK_SIZE):
+        for start in range(0, N, chunk_size):
+            yield start, min(start + chunk_size, N)
+
+    @staticmethod
+    def standardizeInPlace(X):
+        """
+        Computes the mean image chunk by chunk and, for float matrices, subtracts it
+        from every row in place. uint8 matrices are left as raw pixels.
+
+        Returns:
+        The mean array (float32)
+        """
+        N, D = X.shape
+        total = np.zeros(D, dtype=np.float64)
+        for start, stop in ImagePCA.chunkRanges(N):
+            total += np.sum(X[start:stop], axis=0, dtype=np.float64)
+        mean_array = (total / max(N, 1)).astype(np.float32)
+
+        if ImagePCA.isStandardized(X):
+            for start, stop in ImagePCA.chunkRanges(N):
+                X[start:stop] -= mean_array
+        return mean_array
+
+    @staticmethod
+    def centeredRows(X, mean_array, start, stop):
+        """
+        Returns:
+        Rows start:stop of X as standardized float32 images
+        """
+        rows = X[start:stop]
+        if ImagePCA.isStandardized(X):
+            return rows.astype(np.float32, copy=False)
+        return rows.astype(np.float32) - mean_array
+
+    @staticmethod
+    def meanPath(path):
+        return (path[:-4] if path.endswith('.npy') else path) + '.mean.npy'
+
+    @staticmethod
+    def saveMatrix(path, X, mean_array):
+        """
+        Saves the image matrix as a .npy file (and the mean next to it) so it can be
+        reopened memory-mapped with openMatrix
+        """
+        np.save(path, X)
+        np.save(ImagePCA.meanPath(path), mean_array)
+
+    @staticmethod
+    def openMatrix(path, mode='r'):
+        """
+        Returns:
+        (X, mean_array), X is memory-mapped from the .npy file
+        """
+        X = np.load(path, mmap_mode=mode)
+        mean_array = np.load(ImagePCA.meanPath(path))
+        return X, mean_array
             
     @staticmethod
     def preprocessImage(image, width, height):
         """
-        Preprocesses the image by converting it to numpy array
+        Preprocesses the image by converting it to numpy array.
+        JPEGs are decoded at reduced size (draft mode) and converted to grayscale
+        before resizing.
         """
-        image_resized = image.resize((width, height), Image.NEAREST)
-        image_gray = image_resized.convert('L')
-        image_1d = np.array(image_gray).flatten()
+        if image.format == 'JPEG':
+            image.draft('L', (width, height))
+        image_gray = image.convert('L')
+        image_resized = image_gray.resize((width, height), Image.NEAREST)
+        image_1d = np.array(image_resized).flatten()
         return image_1d
     
     def preprocessQueryImage(self, image, width=100, height=100):
@@ -164,6 +368,30 @@ class ImagePCA:
         std_image = image_1d - self.X_mean_array
         return std_image
 
+    @staticmethod
+    def preprocessImageBytes(content, width=100, height=100):
+        """
+        Decodes an encoded image (file content) and preprocesses it
+        """
+        with Image.open(BytesIO(content)) as img:
+            return ImagePCA.preprocessImage(img, width, height)
+
+    def preprocessQueryImages(self, contents, width=100, height=100, workers=None):
+        """
+        Decodes the encoded query images in parallel and standardizes them
+
+        Returns:
+        A Q x D float32 matrix, one standardized query image per row
+        """
+        if not self.fit_done:
+            raise ValueError('Fit the model first')
+        Q = ImagePCA.allocateImageMatrix(len(contents), width * height)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for i, image_1d in enumerate(executor.map(ImagePCA.preprocessImageBytes, contents, [width]*len(contents), [height]*len(contents))):
+                Q[i] = image_1d
+        Q -= self.X_mean_array
+        return Q
+
     @staticmethod
     def preprocessImages(images, width=100, height=100):
         """
@@ -195,6 +423,50 @@ class ImagePCA:
         cov = np.matmul(X_transposed, X) / N
         return cov
     
+    @staticmethod
+    def dataOperator(X, mean_array):
+        """
+        Returns:
+        The D x N matrix of standardized images scaled by 1/sqrt(N), as a LinearOperator
+        that works chunk by chunk on X, so X is never transposed or copied as a whole
+        """
+        N, D = X.shape
+        scale = np.float32(1 / np.sqrt(N))
+
+        def matmat(V):
+            V = np.asarray(V, dtype=np.float32).reshape(N, -1)
+            out = np.zeros((D, V.shape[1]), dtype=np.float32)
+            for start, stop in ImagePCA.chunkRanges(N):
+                out += ImagePCA.centeredRows(X, mean_array, start, stop).T @ V[start:stop]
+            return out * scale
+
+        def rmatmat(W):
+            W = np.asarray(W, dtype=np.float32).reshape(D, -1)
+            out = np.empty((N, W.shape[1]), dtype=np.float32)
+            for start, stop in ImagePCA.chunkRanges(N):
+                out[start:stop] = ImagePCA.centeredRows(X, mean_array, start, stop) @ W
+            return out * scale
+
+        return splg.LinearOperator(
+            (D, N),
+            matvec=lambda v: matmat(v).ravel(),
+            rmatvec=lambda u: rmatmat(u).ravel(),
+            matmat=matmat,
+            rmatmat=rmatmat,
+            dtype=np.float32,
+        )
+
+    @staticmethod
+    def projectRows(X, mean_array, U_k):
+        """
+        Returns:
+        The N x k projection of every row of the image matrix X, computed chunk by chunk
+        """
+        Z = np.empty((X.shape[0], U_k.shape[1]), dtype=np.float32)
+        for start, stop in ImagePCA.chunkRanges(X.shape[0]):
+            Z[start:stop] = ImagePCA.centeredRows(X, mean_array, start, stop) @ U_k
+        return Z
+
     @staticmethod
     def svdKPrincipleComponents(X, k_components=6):
         """
@@ -203,30 +475,464 @@ class ImagePCA:
         """
         U_k, S_k, Vt_k = splg.svds(X, k_components, which='LM', return_singular_vectors="u")
         return U_k, S_k, Vt_k
+
+    @staticmethod
+    def randomizedSvd(A, k_components=6, n_oversamples=10, n_iter=4, random_state=0):
+        """
+        Randomized SVD (Halko et al.) with power iterations on the D x N operator A
+
+        Returns:
+        U_k, S_k, Vt_k
+        """
+        D, N = A.shape
+        rng = np.random.default_rng(random_state)
+        n_random = min(k_components + n_oversamples, D, N)
+
+        Q, _ = np.linalg.qr(A.matmat(rng.standard_normal((N, n_random)).astype(np.float32)))
+        for _ in range(n_iter):
+            Q, _ = np.linalg.qr(A.rmatmat(Q))
+            Q, _ = np.linalg.qr(A.matmat(Q))
+
+        B = A.rmatmat(Q).T
+        U_b, S, Vt = np.linalg.svd(B, full_matrices=False)
+        U = Q @ U_b
+        return U[:, :k_components], S[:k_components], Vt[:k_components]
+
+    @staticmethod
+    def gramPrincipalComponents(X, mean_array, k_components=6):
+        """
+        Eigendecomposition of the N x N Gram matrix of the standardized images,
+        cheaper than an SVD of the D x N matrix when N is much smaller than D
+
+        Returns:
+        U_k, S_k, Vt_k
+        """
+        N = X.shape[0]
+        G = np.empty((N, N), dtype=np.float64)
+        for start_i, stop_i in ImagePCA.chunkRanges(N):
+            rows_i = ImagePCA.centeredRows(X, mean_array, start_i, stop_i)
+            for start_j, stop_j in ImagePCA.chunkRanges(N):
+                if start_j < start_i:
+                    continue
+                rows_j = ImagePCA.centeredRows(X, mean_array, start_j, stop_j)
+                G[start_i:stop_i, start_j:stop_j] = rows_i @ rows_j.T
+                G[start_j:stop_j, start_i:stop_i] = G[start_i:stop_i, start_j:stop_j].T
+        G /= N
+
+        eigenvalues, V = sla.eigh(G, subset_by_index=[N - k_components, N - 1])
+        S = np.sqrt(np.maximum(eigenvalues, 0))
+        S_safe = np.where(S > 0, S, 1)
+        U = ImagePCA.dataOperator(X, mean_array).matmat(V) / S_safe.astype(np.float32)
+        return U, S, V.T
+
+    GRAM_MAX_SAMPLES = 1000
+
+    @staticmethod
+    def chooseSolver(N, D):
+        """
+        Returns:
+        "gram" when N is small and much smaller than D, otherwise "randomized".
+        Building the Gram matrix costs N^2 * D, so it only wins for small corpora.
+        """
+        return "gram" if N <= ImagePCA.GRAM_MAX_SAMPLES and N * 4 <= D else "randomized"
+
+    @staticmethod
+    def subspaceSimilarity(U_a, U_b):
+        """
+        Returns:
+        Cosines of the principal angles between the column spaces of U_a and U_b,
+        1 means the same subspace. Used to measure solver accuracy against an exact SVD.
+        """
+        return np.linalg.svd(U_a.T @ U_b, compute_uv=False)
     
-    def fit(self, images, mean_array, k_components=10):
+    def fit(self, images, mean_array, k_components=10, solver="auto", n_iter=4, n_oversamples=10):
         """
         Fits the PCA model to the images
         Args:
-        images: List of images as numpy arrays
-        n_components: Number of components to keep
+        images: N x D image matrix from loadAndPreprocessData (or a list of images as numpy arrays)
+        mean_array: The mean array, subtracted on the fly if images holds raw uint8 pixels
+        k_components: Number of components to keep
+        solver: "arpack", "randomized", "gram" or "auto"
+        n_iter, n_oversamples: Power iterations and extra random vectors of the randomized solver
         """
         start_time = time.time()
-        X = ImagePCA.imagesListToArray(images)
-        N = X.shape[0]
-        X = np.transpose(X) / np.sqrt(N)
-        # cov = ImagePCA.covariance(X)
-        
-        U, S, Vt = ImagePCA.svdKPrincipleComponents(X, k_components)
+        X = images if isinstance(images, np.ndarray) else ImagePCA.imagesListToArray(images)
+        N, D = X.shape
+        A = ImagePCA.dataOperator(X, mean_array)
+
+        if solver == "auto":
+            solver = ImagePCA.chooseSolver(N, D)
+        if solver == "arpack":
+            U, S, Vt = ImagePCA.svdKPrincipleComponents(A, k_components)
+        elif solver == "randomized":
+            U, S, Vt = ImagePCA.randomizedSvd(A, k_components, n_oversamples, n_iter)
+        elif solver == "gram":
+            U, S, Vt = ImagePCA.gramPrincipalComponents(X, mean_array, k_components)
+        else:
+            raise ValueError(f'Unknown solver: {solver}')
+        svd_time = time.time() - start_time
+
         idx = np.argsort(S)[::-1]   # Indices to sort singular values in descending order
         S = S[idx]                  # Sorted singular values
         U = U[:, idx]               # Reorder left singular vectors
         self.U = U
         self.S = S
         self.X_mean_array = mean_array
+        self.k_components = k_components
+        self.n_samples = N
+        self.total_variance = 0.0
+        for start, stop in ImagePCA.chunkRanges(N):
+            rows = ImagePCA.centeredRows(X, mean_array, start, stop)
+            self.total_variance += float(np.einsum('ij,ij->', rows, rows, dtype=np.float64)) / N
+        self.drift = 0.0
+        self.n_incremental = 0
+        self.indexes = {}
+        self.setProjections(ImagePCA.projectRows(X, mean_array, U))
         self.fit_done = True
         end_time = time.time()
+        self.fit_info = {
+            "solver": solver,
+            "svd_time": svd_time,
+            "time": end_time - start_time,
+            "explained_variance_ratio": float(np.sum(self.explainedVarianceRatio())),
+        }
         print("Fitting time: ", end_time - start_time)
+        print(f"Solver: {solver}, SVD time: {svd_time:.4f}, explained variance: {self.fit_info['explained_variance_ratio']:.4f}")
+
+    def explainedVariance(self):
+        """
+        Returns:
+        The variance of the data along each principal component
+        """
+        return self.S.astype(np.float64) ** 2
+
+    def explainedVarianceRatio(self):
+        """
+        Returns:
+        The fraction of the total variance explained by each principal component
+        """
+        if self.total_variance <= 0:
+            return np.zeros_like(self.explainedVariance())
+        return self.explainedVariance() / self.total_variance
+
+    def residualRatio(self):
+        """
+        Returns:
+        The fraction of the variance of the fitted data not explained by U
+        """
+        if self.total_variance <= 0:
+            return 0.0
+        return max(0.0, 1 - float(np.sum(self.explainedVarianceRatio())))
+
+    def copy(self):
+        """
+        Returns:
+        A shallow copy of the model that partialFit can update while queries keep
+        using this one: partialFit replaces the arrays instead of writing into them,
+        only the indexes are copied
+        """
+        pca = copy.copy(self)
+        pca.indexes = {kind: copy.copy(index) for kind, index in self.indexes.items()}
+        return pca
+
+    def partialFit(self, images, filenames=None):
+        """
+        Folds a batch of new images into the fitted model (incremental PCA).
+        The mean, U, S and the projections Z are updated in place; the cost depends
+        on the batch size and k_components, not on the number of fitted images.
+        Args:
+        images: List of unstandardized 1D images as numpy arrays (see preprocessImage)
+        filenames: Filenames of the images, appended to self.filenames
+
+        Returns:
+        The drift of the model after the update
+        """
+        if not self.fit_done:
+            raise ValueError('Fit the model first')
+        start_time = time.time()
+        X_b = np.array(images, dtype=np.float64)
+        b = X_b.shape[0]
+        if b == 0:
+            return self.drift
+        n = self.n_samples
+        n_total = n + b
+
+        # Drift: variance of the batch that the current basis does not explain,
+        # compared to the same ratio on the fitted data
+        X_c = X_b - self.X_mean_array
+        batch_energy = float(np.einsum('ij,ij->', X_c, X_c))
+        proj = X_c @ self.U
+        if batch_energy > 0:
+            batch_residual = 1 - float(np.einsum('ij,ij->', proj, proj)) / batch_energy
+            batch_drift = max(0.0, batch_residual - self.residualRatio())
+        else:
+            batch_drift = 0.0
+        self.drift = (self.drift * self.n_incremental + batch_drift * b) / (self.n_incremental + b)
+        self.n_incremental += b
+
+        mean_old = np.asarray(self.X_mean_array, dtype=np.float64)
+        U_new, S_new, mean_new, self.total_variance = ImagePCA.incrementalUpdate(
+            self.U, self.S, mean_old, n, self.total_variance, X_b
+        )
+
+        # Re-express the old projections in the new basis
+        rotation = self.U.T @ U_new
+        shift = (mean_old - mean_new) @ U_new
+        Z_old = np.asarray(self.Z) @ rotation + shift
+        Z_new = (X_b - mean_new) @ U_new
+
+        self.U = U_new
+        self.S = S_new
+        self.X_mean_array = mean_new.astype(np.asarray(self.X_mean_array).dtype)
+        self.setProjections(np.vstack((Z_old, Z_new)))
+        for index in self.indexes.values():
+            index.update(self.Z, rotation.astype(np.float32), shift.astype(np.float32), n)
+        self.n_samples = n_total
+        if filenames is not None:
+            self.filenames = list(self.filenames or []) + list(filenames)
+        end_time = time.time()
+        print("Partial fitting time: ", end_time - start_time)
+        return self.drift
+
+    @staticmethod
+    def incrementalUpdate(U, S, mean_array, n, total_variance, X_b):
+        """
+        One incremental SVD step: merges the batch X_b (b x D, unstandardized) into
+        a basis U, S fitted on n samples with the given mean and total variance
+
+        Returns:
+        (U_new, S_new, mean_new, total_variance_new)
+        """
+        b = X_b.shape[0]
+        n_total = n + b
+        k = U.shape[1]
+
+        # Basis of the old data (S * U^T, unscaled), the centered batch and a
+        # correction row for the shift of the mean
+        batch_mean = np.mean(X_b, axis=0)
+        mean_new = mean_array + (batch_mean - mean_array) * (b / n_total)
+        mean_correction = np.sqrt(n * b / n_total) * (mean_array - batch_mean)
+        X_c = X_b - batch_mean
+        M = np.vstack((
+            (S * np.sqrt(n))[:, None] * U.T,
+            X_c,
+            mean_correction[None, :],
+        ))
+        _, S_new, Vt = np.linalg.svd(M, full_matrices=False)
+        U_new = Vt[:k].T
+        S_new = S_new[:k] / np.sqrt(n_total)
+
+        total_variance_new = (
+            n * total_variance
+            + float(np.einsum('ij,ij->', X_c, X_c))
+            + float(mean_correction @ mean_correction)
+        ) / n_total
+        return U_new, S_new, mean_new, total_variance_new
+
+    @staticmethod
+    def iterImageChunks(image_paths, width=100, height=100, chunk_size=CHUNK_SIZE):
+        """
+        Yields the images in image_paths as raw uint8 matrices of at most chunk_size rows
+        """
+        for start in range(0, len(image_paths), chunk_size):
+            batch_paths = image_paths[start:start + chunk_size]
+            chunk = np.empty((len(batch_paths), width * height), dtype=np.uint8)
+            for i, image_path in enumerate(batch_paths):
+                chunk[i] = ImagePCA.processImagePath(image_path, width, height)
+            yield chunk
+
+    @staticmethod
+    def iterMatrixChunks(X, chunk_size=CHUNK_SIZE):
+        """
+        Yields row chunks of an (unstandardized, e.g. memory-mapped uint8) image matrix
+        """
+        for start, stop in ImagePCA.chunkRanges(X.shape[0], chunk_size):
+            yield X[start:stop]
+
+    # Di atas dimensi ini matrix covariance D x D terlalu besar, pakai incremental
+    COVARIANCE_MAX_DIM = 4096
+
+    def fitStreaming(self, chunks, k_components=10, method="auto", D=None):
+        """
+        Fits the PCA model without holding the whole dataset in memory. Memory use is
+        bounded by the chunk size (plus D x D for the covariance method, and the N x k projections).
+        Args:
+        chunks: Zero-argument function returning an iterator of unstandardized image chunks
+                (see iterImageChunks / iterMatrixChunks). Called once per pass over the data.
+        k_components: Number of components to keep
+        method: "covariance" (accumulates mean and D x D covariance), "incremental" (one pass
+                of incremental SVD), or "auto"; both make a second pass for the projections"
+        D: Number of pixels per image, used by "auto" to pick the method. When it is not
+           given the first chunk is read (and decoded) just to find it.
+        """
+        start_time = time.time()
+        if method == "auto":
+            if D is None:
+                first = next(iter(chunks()), None)
+                D = first.shape[1] if first is not None else 0
+            method = "covariance" if D <= ImagePCA.COVARIANCE_MAX_DIM else "incremental"
+
+        if method == "covariance":
+            N = 0
+            total = None
+            C = None
+            for chunk in chunks():
+                rows = np.asarray(chunk, dtype=np.float64)
+                if total is None:
+                    total = np.zeros(rows.shape[1])
+                    C = np.zeros((rows.shape[1], rows.shape[1]))
+                N += rows.shape[0]
+                total += rows.sum(axis=0)
+                C += rows.T @ rows
+            if N == 0:
+                raise ValueError('No images to fit')
+            mean_array = total / N
+            cov = C / N - np.outer(mean_array, mean_array)
+            del C
+            D = cov.shape[0]
+            eigenvalues, U = sla.eigh(cov, subset_by_index=[D - k_components, D - 1])
+            S = np.sqrt(np.maximum(eigenvalues, 0))
+            total_variance = float(np.trace(cov))
+            del cov
+
+            idx = np.argsort(S)[::-1]
+            S = S[idx]
+            U = U[:, idx]
+            Z = np.empty((N, k_components), dtype=np.float32)
+            row = 0
+            for chunk in chunks():
+                Z[row:row + len(chunk)] = (np.asarray(chunk, dtype=np.float64) - mean_array) @ U
+                row += len(chunk)
+
+        elif method == "incremental":
+            U = None
+            pending = []
+            for chunk in chunks():
+                rows = np.asarray(chunk, dtype=np.float64)
+                if U is None:
+                    # Initial basis from the first k_components + 1 images
+                    pending.append(rows)
+                    if sum(len(p) for p in pending) <= k_components:
+                        continue
+                    rows = np.vstack(pending)
+                    pending = []
+                    N = rows.shape[0]
+                    mean_array = rows.mean(axis=0)
+                    X_c = rows - mean_array
+                    _, S, Vt = np.linalg.svd(X_c, full_matrices=False)
+                    U = Vt[:k_components].T
+                    S = S[:k_components] / np.sqrt(N)
+                    total_variance = float(np.einsum('ij,ij->', X_c, X_c)) / N
+                    continue
+
+                U, S, mean_array, total_variance = ImagePCA.incrementalUpdate(U, S, mean_array, N, total_variance, rows)
+                N += rows.shape[0]
+            if U is None:
+                raise ValueError(f'Need more than {k_components} images to fit')
+
+            # Project against the final basis, rotating the projections of earlier chunks
+            # along with every update only approximates them
+            Z = np.empty((N, k_components), dtype=np.float32)
+            row = 0
+            for chunk in chunks():
+                Z[row:row + len(chunk)] = (np.asarray(chunk, dtype=np.float64) - mean_array) @ U
+                row += len(chunk)
+
+        else:
+            raise ValueError(f'Unknown method: {method}')
+
+        self.U = U
+        self.S = S
+        self.X_mean_array = mean_array.astype(np.float32)
+        self.k_components = k_components
+        self.n_samples = N
+        self.total_variance = total_variance
+        self.drift = 0.0
+        self.n_incremental = 0
+        self.indexes = {}
+        self.setProjections(Z)
+        self.fit_done = True
+        end_time = time.time()
+        self.fit_info = {
+            "solver": f"streaming-{method}",
+            "time": end_time - start_time,
+            "explained_variance_ratio": float(np.sum(self.explainedVarianceRatio())),
+        }
+        print("Fitting time: ", end_time - start_time)
+        print(f"Solver: streaming-{method}, explained variance: {self.fit_info['explained_variance_ratio']:.4f}")
+
+    def save(self, path):
+        """
+        Saves the fitted model (U, S, mean, projections, filenames, fingerprint, indexes) as a .npz file
+        """
+        if not self.fit_done:
+            raise ValueError('Fit the model first')
+        np.savez(
+            path,
+            U=self.U,
+            S=self.S,
+            X_mean_array=self.X_mean_array,
+            Z=self.Z,
+            filenames=np.array(self.filenames if self.filenames is not None else [], dtype=str),
+            shape=np.array([self.width or 0, self.height or 0, self.k_components or 0]),
+            fingerprint=np.array(self.fingerprint or ""),
+            stats=np.array([self.n_samples, self.total_variance, self.drift, self.n_incremental]),
+            indexes=np.array(list(self.indexes), dtype=str),
+            **{
+                f"index_{kind}_{name}": array
+                for kind, index in self.indexes.items()
+                for name, array in index.toArrays().items()
+            },
+        )
+
+    @staticmethod
+    def load(path):
+        """
+        Returns:
+        The ImagePCA model saved by save()
+        """
+        with np.load(path) as data:
+            pca = ImagePCA()
+            pca.U = data["U"]
+            pca.S = data["S"]
+            pca.X_mean_array = data["X_mean_array"]
+            pca.setProjections(data["Z"])
+            pca.filenames = data["filenames"].tolist()
+            pca.width, pca.height, pca.k_components = (int(x) for x in data["shape"])
+            pca.fingerprint = str(data["fingerprint"]) or None
+            n_samples, total_variance, drift, n_incremental = data["stats"]
+            pca.n_samples = int(n_samples)
+            pca.total_variance = float(total_variance)
+            pca.drift = float(drift)
+            pca.n_incremental = int(n_incremental)
+            for kind in data["indexes"].tolist() if "indexes" in data else []:
+                prefix = f"index_{kind}_"
+                arrays = {name[len(prefix):]: data[name] for name in data.files if name.startswith(prefix)}
+                pca.indexes[kind] = INDEX_TYPES[kind].fromArrays(pca.Z, arrays)
+        pca.fit_done = True
+        return pca
+
+    def setProjections(self, Z):
+        """
+        Stores the projected dataset as a contiguous N x k float32 matrix
+        """
+        self.Z = np.ascontiguousarray(Z, dtype=np.float32)
+        # Center and spread of Z, used to estimate the mean query distance without a full scan
+        if len(self.Z):
+            self.Z_center = np.mean(self.Z, axis=0, dtype=np.float64)
+            self.Z_spread = float(np.mean(np.sum((self.Z - self.Z_center) ** 2, axis=1)))
+        else:
+            self.Z_center = np.zeros(self.Z.shape[1])
+            self.Z_spread = 0.0
+
+    def buildIndex(self, kind, **params):
+        """
+        Builds a nearest-neighbour index ("kdtree" or "ivf") over the projections Z
+        """
+        if not self.fit_done:
+            raise ValueError('Fit the model first')
+        self.indexes[kind] = buildIndex(kind, self.Z, **params)
+        return self.indexes[kind]
 
     @staticmethod
     def projectToPrincipalComponents(X, U_k):
@@ -245,33 +951,138 @@ class ImagePCA:
         """
         return np.linalg.norm(q - zi)
 
-    def findSimilarImages(self, prepocessed_query, preprocessed_images, k):
+    @staticmethod
+    def euclideanDistances(q, Z):
+        """
+        Returns:
+        The euclidean distances between the query vector q and every row of Z
+        """
+        diff = Z - q
+        return np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    @staticmethod
+    def topK(distances, k):
+        """
+        Returns:
+        The indices of the k smallest distances, sorted by distance
+        """
+        k = min(k, len(distances))
+        if k < len(distances):
+            idx = np.argpartition(distances, k - 1)[:k]
+        else:
+            idx = np.arange(len(distances))
+        return idx[np.argsort(distances[idx], kind='stable')]
+
+    def estimateMeanDistance(self, query_Z):
+        """
+        Returns:
+        An estimate of the mean distance from query_Z to every projected image,
+        sqrt(||q - center||^2 + spread) in O(k). Every search over the fitted images
+        normalizes its similarities with it, so the index searches stay sub-linear
+        """
+        return float(np.sqrt(np.sum((query_Z - self.Z_center) ** 2) + self.Z_spread))
+
+    def findSimilarImages(self, prepocessed_query, preprocessed_images, k, method="exact", **search_params):
         """    
         Parameters:
         prepocessed_query: The standardized query image as 1D numpy array
-        preprocessed_images: A list of standardized images as 1D numpy array
-        U_k: The matrix of k principal components
+        preprocessed_images: A list of standardized images as 1D numpy array, or None to use
+                             the projections precomputed by fit (self.Z)
         k: The number of most similar images to return
+        method: "exact" (full scan), or an index: "kdtree" (eps=...) or "ivf" (nprobe=...).
+                Indexes need preprocessed_images=None and are built on first use.
         
         Returns:
-        A list of (indices, euclideanDistance) of the k most similar images to the query image
+        A list of (index, euclidean_distance, similarity) of the k most similar images to the query image
         """
         start = time.time()
         if not self.fit_done:
             raise ValueError('Fit the model first')
         
-        query_Z = ImagePCA.projectToPrincipalComponents(prepocessed_query, self.U)
+        query_Z = ImagePCA.projectToPrincipalComponents(prepocessed_query, self.U).astype(np.float32)
 
-        distances = []
-        for i, img in enumerate(preprocessed_images):
-            img_Z = ImagePCA.projectToPrincipalComponents(img, self.U)
-            distance = ImagePCA.euclideanDistance(query_Z, img_Z)
-            distances.append((i, distance))
-        
-        distances.sort(key=lambda x: x[1], reverse=False)
+        if method != "exact":
+            if preprocessed_images is not None:
+                raise ValueError('Index search only works on the fitted images')
+            index = self.indexes.get(method) or self.buildIndex(method)
+            idx, distances = index.search(self.Z, query_Z, k, **search_params)
+            dmean = self.estimateMeanDistance(query_Z)
+            result = [
+                (int(i), float(d), 1 / (1 + float(d) / dmean) if dmean > 0 else 1.0)
+                for i, d in zip(idx, distances)
+            ]
+            end = time.time()
+            print(f"Time to find similar images ({method}): ", end - start)
+            return result
+
+        if preprocessed_images is None:
+            images_Z = self.Z
+        else:
+            images_Z = ImagePCA.projectRows(np.asarray(preprocessed_images), self.X_mean_array, self.U)
+
+        distances = ImagePCA.euclideanDistances(query_Z, images_Z)
+        idx = ImagePCA.topK(distances, k)
 
-        dmean = np.mean([d for i, d in distances])
-        distances = [(i, d, 1 / (1 + d/dmean)) for i, d in distances]
+        # The fitted images are normalized like the index and cascade searches, so a pair
+        # scores the same whatever the method
+        if preprocessed_images is None:
+            dmean = self.estimateMeanDistance(query_Z)
+        else:
+            dmean = float(np.mean(distances, dtype=np.float64))
+        result = [
+            (int(i), float(distances[i]), 1 / (1 + float(distances[i]) / dmean) if dmean > 0 else 1.0)
+            for i in idx
+        ]
         end = time.time()
         print("Time to find similar images: ", end - start)
-        return distances[:k]
\ No newline at end of file
+        return result
+
+    # Batas elemen matrix jarak Q x N yang dihitung sekaligus
+    MAX_DISTANCE_BLOCK = 1 << 24
+
+    def findSimilarImagesBatch(self, prepocessed_queries, k):
+        """
+        Parameters:
+        prepocessed_queries: Q x D matrix of standardized query images
+        k: The number of most similar images to return for every query
+
+        Returns:
+        A list with, for every query, a list of (index, euclidean_distance, similarity)
+        of the k most similar images, like findSimilarImages
+        """
+        start = time.time()
+        if not self.fit_done:
+            raise ValueError('Fit the model first')
+
+        queries_Z = ImagePCA.projectRows(np.asarray(prepocessed_queries), self.X_mean_array, self.U)
+        Z = self.Z
+        N = Z.shape[0]
+        k = min(k, N)
+        Z_sq = np.einsum('ij,ij->i', Z, Z)
+
+        results = []
+        block = max(1, ImagePCA.MAX_DISTANCE_BLOCK // max(N, 1))
+        for block_start in range(0, queries_Z.shape[0], block):
+            block_Z = queries_Z[block_start:block_start + block]
+            q_sq = np.einsum('ij,ij->i', block_Z, block_Z)
+            # ||q - z||^2 = ||q||^2 + ||z||^2 - 2 q.z for every (query, image) pair at once
+            distances = q_sq[:, None] + Z_sq[None, :] - 2 * (block_Z @ Z.T)
+            np.maximum(distances, 0, out=distances)
+            np.sqrt(distances, out=distances)
+
+            if k < N:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(N), (len(block_Z), N))
+            for q, idx in enumerate(top):
+                # Exact distances for the top-k only, the expansion above loses precision near 0
+                exact = ImagePCA.euclideanDistances(block_Z[q], Z[idx])
+                order = np.argsort(exact, kind='stable')
+                dmean = self.estimateMeanDistance(block_Z[q])
+                results.append([
+                    (int(idx[j]), float(exact[j]), 1 / (1 + float(exact[j]) / dmean) if dmean > 0 else 1.0)
+                    for j in order
+                ])
+        end = time.time()
+        print("Time to find similar images (batch): ", end - start)
+        return results
@@ -1,54 +1,82 @@
+import heapq
 import os
 import time
 import numpy as np
-from mido import MidiFile
+import scipy.sparse
 from multiprocessing import Pool
 
-# Process MIDI to extract note data
-def process_midi(midi_path):
-    window_size_beats = 40
-    stride_beats = 8
+from api.midi_reader import read_midi_notes
+
+WINDOW_SIZE_BEATS = 40
+STRIDE_BEATS = 8
 
+# Weights of the ATB, RTB and FTB cosine similarities
+FEATURE_WEIGHTS = (0.2, 0.4, 0.4)
+# Alignment modes: "start" compares windows from the start of both files,
+# "all" tries every offset of the query inside the database file
+ALIGNMENTS = ("start", "all")
+# Maximum number of elements of one query x database window similarity block
+ALIGN_BLOCK = 1 << 22
+# Version of the window features, stored features of another version are recomputed
+# (2: notes of all tracks merged on absolute time)
+FEATURE_VERSION = 2
+# Number of consecutive pitch intervals in the n-grams of the candidate index
+NGRAM_SIZE = 3
+
+# Process MIDI to extract note data
+def process_midi(midi_path, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS):
     try:
-        midi = MidiFile(midi_path)
-        ticks_per_beat = midi.ticks_per_beat
-
-        notes = []
-        for track in midi.tracks:
-            time_elapsed = 0
-            for msg in track:
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    notes.append((msg.note, time_elapsed / ticks_per_beat))
-                time_elapsed += msg.time
-
-        if not notes:
-            return []
-
-        notes = np.array(notes)
-        pitches = notes[:, 0]
-        beat_durations = np.diff(notes[:, 1], prepend=0)
-        note_representation = np.column_stack((pitches, beat_durations))
-
-        # Precompute cumulative sum for window extraction
-        cumsum_beat_durations = np.cumsum(beat_durations)
-        total_beats = np.sum(beat_durations)
-
-        windows = []
-        start_beat = 0
-        while start_beat < total_beats:
-            mask = (cumsum_beat_durations > start_beat) & \
-                   (cumsum_beat_durations <= start_beat + window_size_beats)
-            current_window = note_representation[mask]
-            if current_window.size > 0:
-                windows.append(current_window)
-            start_beat += stride_beats
-
-        return windows
+        # Notes of all tracks merged on absolute time
+        pitches, beats = read_midi_notes(midi_path)
+        return note_windows(pitches, beats, window_size_beats, stride_beats)
 
     except Exception as e:
         # print(f"Error processing {midi_path}: {e}")
         return []
 
+# Windows of a (pitch, beat) note sequence sorted by beat
+def note_windows(pitches, beats, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS):
+    if not len(pitches):
+        return []
+
+    beat_durations = np.diff(beats, prepend=0)
+    note_representation = np.column_stack((pitches, beat_durations))
+
+    # Precompute cumulative sum for window extraction
+    cumsum_beat_durations = np.cumsum(beat_durations)
+    total_beats = np.sum(beat_durations)
+
+    return extract_windows(note_representation, cumsum_beat_durations, total_beats, window_size_beats, stride_beats)
+
+# Split notes into windows of window_size_beats, one every stride_beats.
+# A window starting at s holds the notes with s < beat <= s + window_size_beats.
+def extract_windows(note_representation, note_beats, total_beats, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS):
+    starts = np.arange(0, total_beats, stride_beats)
+    if len(starts) == 0:
+        return []
+
+    # Window boundaries for every start in one pass with searchsorted
+    monotonic = np.all(note_beats[1:] >= note_beats[:-1])
+    if monotonic:
+        sorted_beats = note_beats
+    else:
+        # Notes of multiple tracks are not in time order, search in sorted order
+        # and keep the original note order inside each window
+        order = np.argsort(note_beats, kind='stable')
+        sorted_beats = note_beats[order]
+    lo = np.searchsorted(sorted_beats, starts, side='right')
+    hi = np.searchsorted(sorted_beats, starts + window_size_beats, side='right')
+
+    windows = []
+    for l, h in zip(lo, hi):
+        if h <= l:
+            continue
+        if monotonic:
+            windows.append(note_representation[l:h])
+        else:
+            windows.append(note_representation[np.sort(order[l:h])])
+    return windows
+
 
 # Feature extraction
 def extract_features(pitches):
@@ -94,50 +122,404 @@ def compute_similarity_batch(query_features, db_features):
 
 # Process a single MIDI file for parallel processing
 def process_single_midi(file_data):
-    midi_file, midi_path = file_data
-    windows = process_midi(midi_path)
+    midi_file, midi_path = file_data[:2]
+    windows = process_midi(midi_path, *file_data[2:])
     if not windows:
         return midi_file, []
 
     features = [extract_features(window[:, 0]) for window in windows]
     return midi_file, features
 
-# Main function
-def get_similar_audio(target_midi_path, search_directory):
-    start_time = time.time()
+# Compute window features of a MIDI file as stacked arrays (for the feature store)
+def compute_midi_features(midi_path, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS):
+    """
+    Returns:
+    (atb, rtb, ftb) with one row per window: atb a dense float32 array,
+    rtb and ftb float32 CSR matrices since nearly all of their 512 bins are zero
+    """
+    return window_features(process_midi(midi_path, window_size_beats, stride_beats))
 
-    # Process target MIDI file
-    target_windows = process_midi(target_midi_path)
-    if not target_windows:
-        return []
+# Compute window features and interval n-grams of a MIDI file, parsing it once
+def compute_midi_data(midi_path, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS, ngram_size=NGRAM_SIZE):
+    windows = process_midi(midi_path, window_size_beats, stride_beats)
+    return window_features(windows), interval_ngrams(windows, ngram_size)
+
+# Stacked (atb, rtb, ftb) features of a list of note windows
+def window_features(windows):
+    features = [extract_features(window[:, 0]) for window in windows]
+    if not features:
+        return stack_features([], [], [])
+    return stack_features(*zip(*features))
+
+# Stack per-window histograms into the stored feature format
+def stack_features(atb, rtb, ftb):
+    dense_atb = np.array(atb, dtype=np.float32).reshape(-1, 128)
+    sparse_rtb = scipy.sparse.csr_matrix(np.array(rtb, dtype=np.float32).reshape(-1, 512))
+    sparse_ftb = scipy.sparse.csr_matrix(np.array(ftb, dtype=np.float32).reshape(-1, 512))
+    return dense_atb, sparse_rtb, sparse_ftb
+
+# Pitch-interval n-grams of note windows, for the candidate index
+def interval_ngrams(windows, ngram_size=NGRAM_SIZE):
+    """
+    Every run of ngram_size consecutive pitch intervals inside a window is encoded
+    as one integer, intervals are transposition invariant like RTB.
+
+    Returns:
+    The sorted unique n-gram codes (int64) of all windows
+    """
+    codes = []
+    for window in windows:
+        intervals = np.diff(window[:, 0].astype(np.int64)) + 127
+        if len(intervals) < ngram_size:
+            continue
+        grams = np.lib.stride_tricks.sliding_window_view(intervals, ngram_size)
+        codes.append(grams @ (255 ** np.arange(ngram_size, dtype=np.int64)))
+    if not codes:
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate(codes))
 
-    target_features = [extract_features(window[:, 0]) for window in target_windows]
+# Pack database window features for batched scoring
+def pack_features(db_features, sparse=True):
+    """
+    db_features is a list of (midi_file, (atb, rtb, ftb)). Every window histogram
+    is L2-normalized so a dot product is a cosine similarity, padding windows are zero.
 
-    # Get all MIDI files in the directory
-    midi_files = [
-        (os.path.basename(f), os.path.join(search_directory, f))
-        for f in os.listdir(search_directory) if f.endswith('.mid')
-    ]
+    All features are packed window-major. ATB is dense (max_windows, files, 128).
+    With sparse=True RTB and FTB are float32 CSR matrices (max_windows * files, 512)
+    where row w * files + f is window w of file f, since almost all of their bins are
+    zero; with sparse=False they are packed dense like ATB.
 
-    # Process all database MIDI files in parallel
-    with Pool(processes=os.cpu_count()) as pool:
-        results = pool.map(process_single_midi, midi_files)
+    Returns:
+    A dict with names (files with at least one window), counts (windows per file),
+    max_windows and features, the three packed feature arrays
+    """
+    db_features = [(midi_file, features) for midi_file, features in db_features if features[0].shape[0]]
+    names = [midi_file for midi_file, _ in db_features]
+    counts = np.array([features[0].shape[0] for _, features in db_features], dtype=np.int64)
+    max_windows = int(counts.max()) if len(counts) else 0
+    n_files = len(names)
 
-    # Compute similarity for all files
-    similar_songs = []
-    for midi_file, db_features in results:
-        if not db_features:
+    packed = []
+    for t, dim in enumerate((128, 512, 512)):
+        if sparse and t > 0:
+            rows, columns, values = [], [], []
+            for i, (_, features) in enumerate(db_features):
+                windows = normalize_windows(scipy.sparse.csr_matrix(features[t], dtype=np.float32)).tocoo()
+                rows.append(windows.row.astype(np.int64) * n_files + i)
+                columns.append(windows.col)
+                values.append(windows.data)
+            if n_files:
+                rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+            packed.append(scipy.sparse.csr_matrix((values, (rows, columns)), shape=(max_windows * n_files, dim), dtype=np.float32))
             continue
+        dense = np.zeros((max_windows, n_files, dim), dtype=np.float32)
+        for i, (_, features) in enumerate(db_features):
+            dense[:counts[i], i] = normalize_windows(dense_windows(features[t]))
+        packed.append(dense)
+    return {"names": names, "counts": counts, "max_windows": max_windows, "features": tuple(packed)}
+
+# Packed features of a subset of the files
+def subset_packed(packed, files, max_windows=None):
+    """
+    max_windows: Only copy the first max_windows windows of every file, for score_packed
+    with a query of at most that many windows (counts keep the real window counts)
+
+    Returns:
+    A packed dict like pack_features for the files at the given positions, in that order
+    """
+    files = np.asarray(files, dtype=np.int64)
+    counts = packed["counts"][files]
+    longest = int(counts.max()) if len(counts) else 0
+    max_windows = longest if max_windows is None else min(longest, max_windows)
+    n_files = len(packed["counts"])
+
+    subset = []
+    for db in packed["features"]:
+        if scipy.sparse.issparse(db):
+            # Row w * F + f is window w of file f
+            rows = (np.arange(max_windows)[:, None] * n_files + files[None, :]).ravel()
+            subset.append(db[rows])
+        else:
+            subset.append(db[:max_windows, files])
+    return {
+        "names": [packed["names"][i] for i in files],
+        "counts": counts,
+        "max_windows": max_windows,
+        "features": tuple(subset),
+    }
+
+# Memory used by packed features in bytes
+def packed_nbytes(packed):
+    total = 0
+    for features in packed["features"]:
+        if scipy.sparse.issparse(features):
+            total += features.data.nbytes + features.indices.nbytes + features.indptr.nbytes
+        else:
+            total += features.nbytes
+    return total
+
+# Window histograms as a dense float32 array
+def dense_windows(windows):
+    if scipy.sparse.issparse(windows):
+        return windows.toarray().astype(np.float32, copy=False)
+    return np.asarray(windows, dtype=np.float32)
+
+# L2-normalize window histograms, empty windows stay zero
+def normalize_windows(windows):
+    if scipy.sparse.issparse(windows):
+        norms = np.sqrt(np.asarray(windows.multiply(windows).sum(axis=1), dtype=np.float32).ravel())
+        scale = np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)
+        return scipy.sparse.csr_matrix(scipy.sparse.diags(scale) @ windows, dtype=np.float32)
+    windows = np.asarray(windows, dtype=np.float32)
+    norms = np.linalg.norm(windows, axis=1, keepdims=True)
+    return np.divide(windows, norms, out=np.zeros_like(windows), where=norms > 0)
 
-        min_windows = min(len(target_features), len(db_features))
-        trimmed_target_features = target_features[:min_windows]
-        trimmed_db_features = db_features[:min_windows]
+# Sum over windows w < len(query) of the cosine of file window w and query window w
+def start_similarity(db, query, n_files):
+    n_windows = query.shape[0]
+    if not scipy.sparse.issparse(db):
+        # (W, F, d) @ (W, d, 1) -> (W, F, 1): cosine of window w of every file with query window w
+        return np.matmul(db[:n_windows], query[:, :, None])[:, :, 0].sum(axis=0, dtype=np.float64)
+    # Sparse: rows w * F .. (w + 1) * F are window w of every file, one product per query window
+    total = np.zeros(n_files)
+    for w in range(n_windows):
+        total += row_block(db, w * n_files, (w + 1) * n_files) @ query[w]
+    return total
+
+# Rows start..end of a CSR matrix as a CSR matrix sharing its data (slicing copies it)
+def row_block(matrix, start, end):
+    first, last = matrix.indptr[start], matrix.indptr[end]
+    return scipy.sparse.csr_matrix(
+        (matrix.data[first:last], matrix.indices[first:last], matrix.indptr[start:end + 1] - first),
+        shape=(end - start, matrix.shape[1]),
+        copy=False,
+    )
+
+# Diagonal sums of the query x file window similarity matrix of every file
+def diagonal_similarity(db, query, n_offsets, n_files, max_windows):
+    """
+    Returns:
+    A (n_offsets, n_files) array, entry (o, f) is the sum over query windows i of the
+    cosine of query window i with window i + o of file f
+    """
+    n_rows = query.shape[0]
+    diagonals = np.zeros((n_offsets, n_files), dtype=np.float32)
+    if scipy.sparse.issparse(db):
+        # (W * F, d) @ (d, Wq) -> (W, F, Wq), query windows in blocks to bound the product
+        rows_per_block = max(1, ALIGN_BLOCK // (max_windows * n_files))
+        for start in range(0, n_rows, rows_per_block):
+            end = min(start + rows_per_block, n_rows)
+            similarity = np.asarray(db @ query[start:end].T, dtype=np.float32).reshape(max_windows, n_files, end - start)
+            for i in range(start, end):
+                diagonals += similarity[i:i + n_offsets, :, i - start]
+        return diagonals
+
+    rows = np.arange(n_rows)[:, None]
+    columns = rows + np.arange(n_offsets)[None, :]
+    block = max(1, ALIGN_BLOCK // (n_rows * max_windows))
+    for start in range(0, n_files, block):
+        end = min(start + block, n_files)
+        # (1, Wq, d) @ (W, d, F) -> (W, Wq, F): every query window against every file window
+        similarity = np.matmul(query[None], db[:, start:end].transpose(0, 2, 1))
+        diagonals[:, start:end] = similarity[columns, rows].sum(axis=0)
+    return diagonals
+
+# Score a query against every packed file at once
+def score_packed(packed, query_features):
+    """
+    Same score as compute_similarity_batch on the first min(query windows, file windows)
+    windows of every file, computed with one batched product per feature type.
+    Padding windows are zero so they add nothing, only the mean has to divide by the
+    trimmed window count.
+
+    Returns:
+    An array with the similarity (0..1) of every file in packed["names"]
+    """
+    counts = packed["counts"]
+    if not len(counts):
+        return np.zeros(0)
+    n_windows = min(query_features[0].shape[0], packed["max_windows"])
+
+    total = np.zeros(len(counts))
+    for weight, db, query in zip(FEATURE_WEIGHTS, packed["features"], query_features):
+        query = normalize_windows(dense_windows(query)[:n_windows])
+        total += weight * start_similarity(db, query, len(counts))
+
+    return total / np.minimum(counts, query_features[0].shape[0])
+
+# Score a query against every packed file at every window offset
+def score_packed_aligned(packed, query_features):
+    """
+    For every file the query windows are slid over the file windows: at offset o
+    query window i is compared with file window i + o, for o = 0..count - query windows
+    (only o = 0, trimmed like score_packed, when the file is shorter than the query).
+    Every offset is a diagonal of the query x file window similarity matrix, which
+    comes from batched products per feature type.
+
+    Returns:
+    (similarities, offsets), the best score (0..1) of every file in packed["names"]
+    and the offset in windows where it was found
+    """
+    counts = packed["counts"]
+    if not len(counts):
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    max_windows = packed["max_windows"]
+    query_windows = query_features[0].shape[0]
+    # Query windows past the longest file never overlap a file window
+    n_rows = min(query_windows, max_windows)
+    n_offsets = max(1, max_windows - query_windows + 1)
+
+    diagonals = np.zeros((n_offsets, len(counts)), dtype=np.float32)
+    for weight, db, query in zip(FEATURE_WEIGHTS, packed["features"], query_features):
+        query = normalize_windows(dense_windows(query)[:n_rows])
+        diagonals += weight * diagonal_similarity(db, query, n_offsets, len(counts), max_windows)
+
+    offsets = np.arange(n_offsets)[:, None]
+    valid = offsets <= np.maximum(counts - query_windows, 0)[None, :]
+    scores = np.where(valid, diagonals / np.minimum(counts, query_windows)[None, :], -np.inf)
+    best = np.argmax(scores, axis=0)
+    return scores[best, np.arange(len(counts))].astype(np.float64), best
+
+# Score every packed file with the given alignment
+def score_files(packed, query_features, alignment="start"):
+    """
+    Returns:
+    (similarities, offsets) of every file in packed["names"], offsets are 0 for alignment="start"
+    """
+    if alignment == "all":
+        return score_packed_aligned(packed, query_features)
+    return score_packed(packed, query_features), np.zeros(len(packed["counts"]), dtype=np.int64)
+
+# Positions of the k largest scores, best first (all of them when k is None)
+def top_k(scores, k=None):
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+# Rank packed files keeping only the k best
+def rank_packed(packed, query_features, k=None, alignment="start", early_stop=False, block_size=256):
+    """
+    With early_stop (alignment "start" only) an upper bound of every score is computed
+    first: the exact ATB part plus the largest possible RTB and FTB part (the cosines
+    are at most 1). The block_size files with the highest bound are scored and their k
+    best kept in a bounded heap; of the other files only those whose bound can still
+    beat the k-th best score are scored. The bound only prunes when the k best scores
+    are above 0.8 (near duplicates), otherwise it costs one ATB pass extra.
+
+    Returns:
+    A list of (position, similarity, offset) of at most k files, best first
+    """
+    n_files = len(packed["counts"])
+    if k is None or k >= n_files or not early_stop or alignment != "start":
+        # All offsets of the ATB part cost about as much as the full score, no bound there
+        scores, offsets = score_files(packed, query_features, alignment)
+        return [(int(i), float(scores[i]), int(offsets[i])) for i in top_k(scores, k)]
+
+    # ATB part only: the zip with FEATURE_WEIGHTS stops after the first feature type
+    atb_only = dict(packed, features=packed["features"][:1])
+    bounds = score_packed(atb_only, query_features[:1]) + sum(FEATURE_WEIGHTS[1:])
+    order = np.argsort(-bounds, kind='stable')
+    # Start alignment never looks past the query windows
+    query_windows = query_features[0].shape[0]
+
+    # Ties go to the lower position, like the stable sort of the full ranking
+    first = order[:max(block_size, k)]
+    scores = score_packed(subset_packed(packed, first, query_windows), query_features)
+    heap = heapq.nlargest(k, zip(scores.tolist(), (-first).tolist()))
+
+    # Files are in order of their bound, the ones that can still beat the k-th score are a prefix
+    rest = order[len(first):]
+    rest = rest[:np.count_nonzero(bounds[rest] + 1e-6 >= heap[-1][0])]
+    if len(rest) > n_files // 4:
+        # The bound pruned too little: copying the rest out costs about three times as
+        # much per file as scoring it in place, score everything instead
+        scores = score_packed(packed, query_features)
+        return [(int(i), float(scores[i]), 0) for i in top_k(scores, k)]
+    if len(rest):
+        scores = score_packed(subset_packed(packed, rest, query_windows), query_features)
+        heap = heapq.nlargest(k, heap + list(zip(scores.tolist(), (-rest).tolist())))
+    return [(-i, score, 0) for score, i in heap]
+
+# Main function
+def get_similar_audio(target_midi_path, search_directory, feature_store=None, window_size_beats=None, stride_beats=None, **search_params):
+    """
+    Returns:
+    The files most similar to the MIDI file target_midi_path, see get_similar_notes
+    """
+    try:
+        pitches, beats = read_midi_notes(target_midi_path)
+    except Exception as e:
+        # print(f"Error processing {target_midi_path}: {e}")
+        return []
+    return get_similar_notes(pitches, beats, search_directory, feature_store, window_size_beats, stride_beats, **search_params)
+
+# Search the MIDI files most similar to a (pitch, beat) note sequence
+def get_similar_notes(pitches, beats, search_directory, feature_store=None, window_size_beats=None, stride_beats=None, pool=None, alignment="start", shortlist=None, shortlist_min_files=0, k=None, early_stop=False):
+    """
+    pitches, beats: The query notes sorted by beat, from a MIDI file (read_midi_notes)
+    or a recording (recording.RecordingTranscriber)
+    shortlist: With a feature store, only the files its n-gram index ranks in the top
+    shortlist are scored (files sharing no rare n-gram with the query are left out),
+    and only once the database has at least shortlist_min_files files
+    k: Only the k most similar files are returned (all files when None), with
+    early_stop files whose score cannot reach the top k are not fully scored
+
+    Returns:
+    A list of (midi_file, similarity) sorted by similarity; with alignment="all"
+    (midi_file, similarity, offset_beats) where offset_beats is the position in the
+    database file where the query matched best
+    """
+    if alignment not in ALIGNMENTS:
+        raise ValueError(f'Unknown alignment: {alignment}')
+    start_time = time.time()
+
+    # Window parameters of the store are used when it is given, the query has to match
+    if feature_store is not None:
+        window_size_beats = feature_store.window_size_beats
+        stride_beats = feature_store.stride_beats
+    window_size_beats = window_size_beats or WINDOW_SIZE_BEATS
+    stride_beats = stride_beats or STRIDE_BEATS
+
+    # Process the query notes
+    ngram_size = feature_store.ngram_size if feature_store is not None else NGRAM_SIZE
+    target_windows = note_windows(pitches, beats, window_size_beats, stride_beats)
+    target_features, target_ngrams = window_features(target_windows), interval_ngrams(target_windows, ngram_size)
+    if not len(target_features[0]):
+        return []
 
-        similarity = compute_similarity_batch(trimmed_target_features, trimmed_db_features) * 100
+    if feature_store is not None:
+        # Database features come from the store, packed once until the directory changes
+        packed, ngram_index = feature_store.search_data(search_directory)
+        if shortlist and len(packed["names"]) >= shortlist_min_files:
+            # Only score the files sharing the most n-grams with the query
+            candidates = ngram_index.candidates(target_ngrams, shortlist)
+            if candidates is not None:
+                packed = subset_packed(packed, candidates)
+    else:
+        # Get all MIDI files in the directory
+        midi_files = [
+            (os.path.basename(f), os.path.join(search_directory, f), window_size_beats, stride_beats)
+            for f in os.listdir(search_directory) if f.endswith('.mid')
+        ]
 
-        similar_songs.append((midi_file, similarity))
+        # Process all database MIDI files in parallel, in the shared worker pool when given
+        if pool is not None:
+            results = pool.map(process_single_midi, midi_files)
+        else:
+            with Pool(processes=os.cpu_count()) as process_pool:
+                results = process_pool.map(process_single_midi, midi_files)
+        packed = pack_features([
+            (midi_file, stack_features(*zip(*features)) if features else stack_features([], [], []))
+            for midi_file, features in results
+        ])
 
-    similar_songs.sort(key=lambda x: x[1], reverse=True)
+    # Rank the files, keeping the k most similar
+    ranked = rank_packed(packed, target_features, k, alignment, early_stop)
+    if alignment == "all":
+        similar_songs = [(packed["names"][i], similarity * 100, offset * stride_beats) for i, similarity, offset in ranked]
+    else:
+        similar_songs = [(packed["names"][i], similarity * 100) for i, similarity, _ in ranked]
 
     end_time = time.time()
     print(f"Execution Time: {(end_time - start_time)*1000:.2f} ms")
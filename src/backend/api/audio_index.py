@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class IntervalNgramIndex:
+    """
+    Inverted index dari n-gram interval pitch (audio.interval_ngrams) ke file MIDI,
+    untuk membuat shortlist kandidat sebelum scoring ATB/RTB/FTB yang exact.
+
+    Posting list disimpan dalam bentuk CSR: codes (n-gram unik, terurut), offsets
+    (batas posting list tiap n-gram) dan postings (nomor file). Kandidat diurutkan
+    berdasarkan jumlah bobot idf n-gram yang sama dengan query. N-gram yang muncul
+    di lebih dari max_df bagian file (misal nada yang diulang) tidak dipakai, supaya
+    posting list yang diperiksa tetap pendek.
+
+    Contoh:
+    ```python
+    index = IntervalNgramIndex([interval_ngrams(windows) for windows in database_windows])
+    files = index.candidates(interval_ngrams(query_windows), shortlist=100)
+    ```
+    """
+
+    def __init__(self, ngram_sets, max_df=0.5):
+        self.n_files = len(ngram_sets)
+        self.max_df = max_df
+        lengths = np.array([len(ngrams) for ngrams in ngram_sets], dtype=np.int64)
+        if lengths.sum():
+            codes = np.concatenate(ngram_sets).astype(np.int64)
+        else:
+            codes = np.zeros(0, dtype=np.int64)
+        files = np.repeat(np.arange(self.n_files), lengths)
+
+        order = np.argsort(codes, kind='stable')
+        self.codes, counts = np.unique(codes[order], return_counts=True)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.postings = files[order]
+        self.idf = np.log1p(self.n_files / np.maximum(counts, 1))
+
+    def candidates(self, query_ngrams, shortlist, min_shared=1):
+        """
+        Returns:
+        Positions of at most shortlist files sharing at least min_shared rare n-grams
+        with the query, best first; None when the query has no usable n-gram
+        (the caller should then score every file)
+        """
+        query_ngrams = np.unique(np.asarray(query_ngrams, dtype=np.int64))
+        positions = np.minimum(np.searchsorted(self.codes, query_ngrams), max(len(self.codes) - 1, 0))
+        if not len(self.codes):
+            return None
+        positions = positions[self.codes[positions] == query_ngrams]
+        lengths = self.offsets[positions + 1] - self.offsets[positions]
+        keep = lengths <= max(1, self.max_df * self.n_files)
+        positions, lengths = positions[keep], lengths[keep]
+        if not len(positions):
+            return None
+
+        # Concatenate the posting lists of all query n-grams without a Python loop
+        starts = self.offsets[positions]
+        entries = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(lengths.sum())
+        files = self.postings[entries]
+        shared = np.bincount(files, minlength=self.n_files)
+        scores = np.bincount(files, weights=np.repeat(self.idf[positions], lengths), minlength=self.n_files)
+
+        matches = np.flatnonzero(shared >= min_shared)
+        if len(matches) > shortlist:
+            matches = matches[np.argpartition(-scores[matches], shortlist - 1)[:shortlist]]
+        return matches[np.argsort(-scores[matches], kind='stable')]
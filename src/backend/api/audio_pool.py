@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Run one chunk of tasks inside a worker process, also returns the time it took
+def run_chunk(fn, chunk):
+    start = time.perf_counter()
+    results = [fn(item) for item in chunk]
+    return results, time.perf_counter() - start
+
+
+class AudioWorkerPool:
+    """
+    Pool proses yang hidup selama aplikasi berjalan dan dipakai bersama oleh
+    semua request, menggantikan multiprocessing.Pool yang dibuat ulang setiap query.
+
+    - Task dikirim per chunk (chunksize item per task) supaya overhead pickling kecil
+    - Jumlah chunk yang sedang berjalan dibatasi max_pending (semaphore), request
+      lain menunggu alih-alih membanjiri pool
+    - stats() memberi metrik pemakaian pool
+
+    Kalau pool belum di-start, map() berjalan serial di proses yang sama.
+
+    Contoh:
+    ```python
+    pool = AudioWorkerPool(max_workers=4)
+    pool.start()
+    features = pool.map(compute_midi_features, midi_paths)
+    print(pool.stats())
+    pool.shutdown()
+    ```
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, chunksize=4):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.chunksize = chunksize
+        self.executor = None
+        self.slots = threading.Semaphore(self.max_pending)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.started_at = time.time()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.reset_stats()
+
+    def shutdown(self):
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @property
+    def running(self):
+        return self.executor is not None
+
+    def map(self, fn, items, chunksize=None):
+        """
+        fn has to be picklable (a module level function or a functools.partial of one)
+
+        Returns:
+        [fn(item) for item in items], computed in the worker processes
+        """
+        items = list(items)
+        executor = self.executor
+        if executor is None or not items:
+            return [fn(item) for item in items]
+
+        chunksize = chunksize or self.chunksize
+        futures = []
+        for start in range(0, len(items), chunksize):
+            chunk = items[start:start + chunksize]
+            wait_start = time.time()
+            self.slots.acquire()
+            try:
+                future = executor.submit(run_chunk, fn, chunk)
+            except Exception:
+                self.slots.release()
+                raise
+            with self.lock:
+                self.wait_time += time.time() - wait_start
+                self.pending += 1
+                self.submitted += 1
+                self.items += len(chunk)
+            future.add_done_callback(self.chunk_done)
+            futures.append(future)
+
+        results = []
+        for future in futures:
+            results.extend(future.result()[0])
+        return results
+
+    def chunk_done(self, future):
+        with self.lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.busy_time += future.result()[1]
+        self.slots.release()
+
+    def stats(self):
+        """
+        Returns:
+        A dict of pool metrics; utilization is the time workers spent running chunks
+        divided by the worker time available since the pool started, wait_time
+        is the time callers spent waiting for a free slot
+        """
+        with self.lock:
+            uptime = time.time() - self.started_at
+            return {
+                "running": self.running,
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "chunksize": self.chunksize,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "items": self.items,
+                "busy_time": round(self.busy_time, 3),
+                "wait_time": round(self.wait_time, 3),
+                "uptime": round(uptime, 3),
+                "utilization": round(self.busy_time / (self.max_workers * uptime), 4) if uptime > 0 else 0.0,
+            }
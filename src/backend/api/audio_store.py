@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import threading
+from functools import partial
+
+import numpy as np
+import scipy.sparse
+
+from api.audio import compute_midi_data, pack_features, WINDOW_SIZE_BEATS, STRIDE_BEATS, NGRAM_SIZE, FEATURE_VERSION
+from api.audio_index import IntervalNgramIndex
+
+
+class AudioFeatureStore:
+    """
+    Menyimpan fitur window (ATB, RTB, FTB) setiap file MIDI di disk, supaya
+    database tidak di-parse dan di-featurize ulang setiap query.
+
+    Fitur disimpan per isi file (<sha1>_w<window>_s<stride>.npz). index.json memetakan nama file ke
+    (size, mtime, sha1); kalau size/mtime berubah file di-hash ulang, dan fitur
+    hanya dihitung ulang kalau isinya memang berubah.
+    Ukuran dan stride window ikut jadi bagian nama file fitur karena fitur
+    bergantung pada keduanya. RTB dan FTB disimpan sebagai matriks CSR float32
+    karena hampir semua bin-nya nol.
+
+    Fitur file baru dihitung di pool (AudioWorkerPool) kalau diberikan, selain itu serial.
+
+    Selain fitur, n-gram interval pitch setiap file (audio.interval_ngrams) juga
+    disimpan untuk index kandidat (IntervalNgramIndex).
+
+    search_data() menyimpan fitur seluruh database yang sudah di-pack untuk
+    scoring batch (audio.pack_features) beserta index n-gram-nya, dan baru dibangun
+    ulang kalau isi direktori berubah. Fitur per file hanya dibaca dari disk saat
+    packing dan tidak disimpan di memori, jadi fitur database hanya ada satu salinan.
+    """
+
+    def __init__(self, store_dir, window_size_beats=WINDOW_SIZE_BEATS, stride_beats=STRIDE_BEATS, pool=None, ngram_size=NGRAM_SIZE):
+        self.store_dir = store_dir
+        self.ngram_size = ngram_size
+        self.pool = pool
+        self.window_size_beats = window_size_beats
+        self.stride_beats = stride_beats
+        self.index_path = os.path.join(store_dir, "index.json")
+        self.index = {}
+        # Index entries added by ingest_file that are not saved yet
+        self.index_dirty = False
+        self.packed = None
+        self.ngram_index = None
+        self.packed_key = None
+        self.lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def load(self):
+        """
+        Loads the file index from disk; features are loaded lazily
+        """
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Failed to load audio feature index: {e}")
+                self.index = {}
+
+    def save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def file_hash(path):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def features_path(self, digest):
+        return os.path.join(self.store_dir, f"{digest}_w{self.window_size_beats}_s{self.stride_beats}.npz")
+
+    def record_hash(self, midi_path, digest):
+        st = os.stat(midi_path)
+        self.index[os.path.basename(midi_path)] = {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}
+
+    def lookup_hash(self, midi_path):
+        """
+        Returns:
+        The content hash of midi_path, rehashing only when its size or mtime changed
+        """
+        name = os.path.basename(midi_path)
+        st = os.stat(midi_path)
+        entry = self.index.get(name)
+        if entry is not None and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry["hash"], False
+        digest = self.file_hash(midi_path)
+        self.index[name] = {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}
+        return digest, True
+
+    def load_features(self, digest):
+        """
+        Returns:
+        ((atb, rtb, ftb), ngrams) stored for digest, None when missing or outdated
+        """
+        path = self.features_path(digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                # Features of older versions or another n-gram size are recomputed
+                if "version" not in data or int(data["version"]) != FEATURE_VERSION:
+                    return None
+                if int(data["ngram_size"]) != self.ngram_size:
+                    return None
+                features = (data["atb"], self.load_histograms(data, "rtb"), self.load_histograms(data, "ftb"))
+                ngrams = data["ngrams"]
+        except Exception as e:
+            print(f"Failed to load audio features {path}: {e}")
+            return None
+        return features, ngrams
+
+    @staticmethod
+    def load_histograms(data, name):
+        """
+        Returns:
+        The CSR matrix stored under name; dense arrays of older stores are converted
+        """
+        if name in data:
+            return scipy.sparse.csr_matrix(data[name], dtype=np.float32)
+        return scipy.sparse.csr_matrix(
+            (data[name + "_data"], data[name + "_indices"], data[name + "_indptr"]),
+            shape=tuple(data[name + "_shape"]),
+        )
+
+    def save_features(self, digest, features, ngrams):
+        atb, rtb, ftb = features
+        arrays = {
+            "atb": atb,
+            "ngrams": ngrams,
+            "ngram_size": np.array(self.ngram_size),
+            "version": np.array(FEATURE_VERSION),
+        }
+        for name, histograms in (("rtb", rtb), ("ftb", ftb)):
+            arrays[name + "_data"] = histograms.data
+            arrays[name + "_indices"] = histograms.indices
+            arrays[name + "_indptr"] = histograms.indptr
+            arrays[name + "_shape"] = np.array(histograms.shape)
+        np.savez(self.features_path(digest), **arrays)
+
+    def compute_features(self, midi_paths):
+        """
+        Returns:
+        The ((atb, rtb, ftb), ngrams) of every path, computed in the worker pool if there is one
+        """
+        fn = partial(
+            compute_midi_data,
+            window_size_beats=self.window_size_beats,
+            stride_beats=self.stride_beats,
+            ngram_size=self.ngram_size,
+        )
+        if self.pool is None:
+            return [fn(midi_path) for midi_path in midi_paths]
+        return self.pool.map(fn, midi_paths)
+
+    def lookup_hashes(self, midi_paths):
+        """
+        Returns:
+        The content hash of every path, see lookup_hash(); the index is saved when it changed
+        """
+        with self.lock:
+            lookups = [self.lookup_hash(midi_path) for midi_path in midi_paths]
+            if self.index_dirty or any(changed for _, changed in lookups):
+                self.save_index()
+                self.index_dirty = False
+        return [digest for digest, _ in lookups]
+
+    def get_data_batch(self, midi_paths):
+        """
+        Returns:
+        The ((atb, rtb, ftb), ngrams) of every path, read from the store; only contents
+        that are not in the store yet are computed, all at once. Nothing is kept in
+        memory, search_data() keeps the packed copy.
+        """
+        digests = self.lookup_hashes(midi_paths)
+        data = [self.load_features(digest) for digest in digests]
+
+        missing = {}
+        for midi_path, digest, d in zip(midi_paths, digests, data):
+            if d is None:
+                missing.setdefault(digest, midi_path)
+        if missing:
+            computed = dict(zip(missing, self.compute_features(list(missing.values()))))
+            with self.lock:
+                for digest, (f, ngrams) in computed.items():
+                    self.save_features(digest, f, ngrams)
+            data = [computed[digest] if d is None else d for digest, d in zip(digests, data)]
+        return data
+
+    def get_features_batch(self, midi_paths):
+        """
+        Returns:
+        The (atb, rtb, ftb) window feature arrays of every path, see get_data_batch()
+        """
+        return [features for features, _ in self.get_data_batch(midi_paths)]
+
+    def get_features(self, midi_path):
+        """
+        Returns:
+        (atb, rtb, ftb) window feature arrays of midi_path, computed only if the
+        content of the file is not in the store yet
+        """
+        return self.get_features_batch([midi_path])[0]
+
+    def ingest_file(self, midi_path, digest):
+        """
+        Computes and stores the features of one MIDI file whose sha1 is already known
+        (hashed while it was uploaded), unless that content is in the store. The
+        index entry is recorded right away so the file is not hashed again, and
+        saved by the next ingest() or sync().
+        """
+        with self.lock:
+            self.record_hash(midi_path, digest)
+            self.index_dirty = True
+            if self.load_features(digest) is not None:
+                return
+        features, ngrams = self.compute_features([midi_path])[0]
+        with self.lock:
+            self.save_features(digest, features, ngrams)
+
+    @staticmethod
+    def fingerprint(search_directory):
+        """
+        Returns:
+        A hex digest of the names, sizes and mtimes of the .mid files in search_directory,
+        changes whenever a file is added, removed or rewritten (one stat per file, no reads)
+        """
+        h = hashlib.sha1()
+        for midi_file in sorted(f for f in os.listdir(search_directory) if f.endswith('.mid')):
+            st = os.stat(os.path.join(search_directory, midi_file))
+            h.update(f"\0{midi_file}:{st.st_size}:{st.st_mtime_ns}".encode())
+        return h.hexdigest()
+
+    def ingest(self, midi_paths):
+        """
+        Computes and stores the features of newly uploaded MIDI files
+        """
+        self.get_features_batch(midi_paths)
+
+    def sync(self, search_directory):
+        """
+        Returns:
+        A list of (midi_file, content hash) for every .mid file in search_directory.
+        Files that were removed are dropped from the index.
+        """
+        midi_files = sorted(f for f in os.listdir(search_directory) if f.endswith('.mid'))
+        digests = self.lookup_hashes([os.path.join(search_directory, f) for f in midi_files])
+
+        with self.lock:
+            removed = set(self.index) - set(midi_files)
+            if removed:
+                for name in removed:
+                    del self.index[name]
+                self.save_index()
+        return list(zip(midi_files, digests))
+
+    def search_data(self, search_directory):
+        """
+        Returns:
+        (packed, ngram_index): the features of every .mid file in search_directory packed
+        by audio.pack_features and the IntervalNgramIndex over the same files (positions
+        match packed["names"]), rebuilt only when a file was added, removed or changed
+        """
+        key = tuple(self.sync(search_directory))
+        with self.lock:
+            if self.packed is not None and key == self.packed_key:
+                return self.packed, self.ngram_index
+
+        # The per-file features only live while packing
+        midi_files = [midi_file for midi_file, _ in key]
+        data = self.get_data_batch([os.path.join(search_directory, f) for f in midi_files])
+        packed = pack_features([(midi_file, features) for midi_file, (features, _) in zip(midi_files, data)])
+        ngrams = dict(zip(midi_files, (file_ngrams for _, file_ngrams in data)))
+        ngram_index = IntervalNgramIndex([ngrams[midi_file] for midi_file in packed["names"]])
+        with self.lock:
+            self.packed, self.ngram_index, self.packed_key = packed, ngram_index, key
+        return packed, ngram_index
+
+    def packed_features(self, search_directory):
+        """
+        Returns:
+        The packed features of search_directory, see search_data()
+        """
+        return self.search_data(search_directory)[0]
+
+    def clear(self):
+        """
+        Drops every stored feature from memory and disk
+        """
+        with self.lock:
+            self.index = {}
+            self.index_dirty = False
+            self.packed = None
+            self.ngram_index = None
+            self.packed_key = None
+            for filename in os.listdir(self.store_dir):
+                if filename.endswith((".npz", ".json")):
+                    os.remove(os.path.join(self.store_dir, filename))
@@ -0,0 +1,154 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+AUDIO_EXTENSIONS = (".mid",)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class UploadCatalog:
+    """
+    Daftar file audio dan gambar yang sudah di-upload, disimpan di memori supaya
+    /get_uploads tidak perlu os.listdir dan memfilter semua nama file di setiap request.
+
+    - Nama file disimpan terurut per jenis ("audio" lalu "image"), halaman diambil
+      dengan slicing (O(size))
+    - Pencarian memakai inverted index n-gram (default trigram) atas nama file dan
+      judul dari mapper (title_of); kandidat dari irisan posting list lalu dicek
+      substring. Kata yang lebih pendek dari n di-scan langsung.
+    - Hasil filter setiap kata pencarian disimpan (LRU, max_searches kata) sampai
+      katalog berubah, jadi membuka halaman berikutnya tidak memfilter ulang
+    - add(), remove() dan refresh() memperbarui index per file, load() hanya sekali
+      saat aplikasi mulai
+
+    Contoh:
+    ```python
+    catalog = UploadCatalog(title_of=lambda name: mapper.get(name + "_name"))
+    catalog.load(audio_dir, image_dir)
+    catalog.add("audio", "Billie_Jean.mid")
+    entries, total = catalog.page(page=1, size=10, search="billie")
+    ```
+    """
+
+    KINDS = ("audio", "image")
+
+    def __init__(self, title_of=None, ngram_size=3, max_searches=32):
+        self.title_of = title_of or (lambda name: None)
+        self.ngram_size = ngram_size
+        self.max_searches = max_searches
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.names = {kind: [] for kind in self.KINDS}
+            self.texts = {}
+            self.postings = defaultdict(set)
+            self.searches = OrderedDict()
+
+    def load(self, audio_dir, image_dir):
+        self.clear()
+        for kind, directory, extensions in (("audio", audio_dir, AUDIO_EXTENSIONS), ("image", image_dir, IMAGE_EXTENSIONS)):
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    if name.endswith(extensions):
+                        self.add(kind, name)
+
+    def ngrams(self, text):
+        n = self.ngram_size
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def search_text(self, name):
+        # "\0" cannot appear in a search term, so a match never spans the name and the title
+        return f"{name}\0{self.title_of(name) or ''}".lower()
+
+    def index(self, key):
+        text = self.search_text(key[1])
+        self.texts[key] = text
+        for gram in self.ngrams(text):
+            self.postings[gram].add(key)
+
+    def unindex(self, key):
+        for gram in self.ngrams(self.texts.pop(key)):
+            posting = self.postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self.postings[gram]
+
+    def add(self, kind, name):
+        key = (kind, name)
+        with self.lock:
+            if key in self.texts:
+                return
+            bisect.insort(self.names[kind], name)
+            self.index(key)
+            self.searches.clear()
+
+    def remove(self, kind, name):
+        key = (kind, name)
+        with self.lock:
+            if key not in self.texts:
+                return
+            names = self.names[kind]
+            del names[bisect.bisect_left(names, name)]
+            self.unindex(key)
+            self.searches.clear()
+
+    def refresh(self, names):
+        """
+        Reindexes the files in names after their mapper titles changed
+        """
+        names = set(names)
+        with self.lock:
+            for key in [key for key in self.texts if key[1] in names]:
+                self.unindex(key)
+                self.index(key)
+            self.searches.clear()
+
+    def __len__(self):
+        return sum(len(names) for names in self.names.values())
+
+    def matches(self, search):
+        """
+        Returns:
+        {kind: sorted names} of the files whose name or title contains search (case insensitive)
+        """
+        search = search.lower()
+        with self.lock:
+            if search in self.searches:
+                self.searches.move_to_end(search)
+                return self.searches[search]
+
+            if len(search) < self.ngram_size:
+                candidates = self.texts.keys()
+            else:
+                postings = sorted((self.postings.get(gram, set()) for gram in self.ngrams(search)), key=len)
+                candidates = set.intersection(*postings)
+            found = {kind: [] for kind in self.KINDS}
+            for key in candidates:
+                if search in self.texts[key]:
+                    found[key[0]].append(key[1])
+            for names in found.values():
+                names.sort()
+
+            self.searches[search] = found
+            while len(self.searches) > self.max_searches:
+                self.searches.popitem(last=False)
+            return found
+
+    def page(self, page, size, search=""):
+        """
+        Returns:
+        (entries, total): the (kind, name) of the files on the page (1-based), audio
+        files first, and the number of files matching search
+        """
+        names = self.matches(search) if search else self.names
+        start = (page - 1) * size
+        entries = []
+        for kind in self.KINDS:
+            kind_names = names[kind]
+            if start < len(kind_names):
+                entries.extend((kind, name) for name in kind_names[start:start + size - len(entries)])
+            start = max(0, start - len(kind_names))
+        return entries, sum(len(kind_names) for kind_names in names.values())
@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a BoundedExecutor already holds max_workers + max_queue jobs"""
+
+    def __init__(self, name, retry_after=1):
+        super().__init__(f"{name} executor is saturated")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool untuk pekerjaan CPU-bound dari endpoint async (fit PCA, decode gambar,
+    pencarian audio, ingest), supaya event loop tetap bebas melayani request lain
+    seperti /get_uploads, /get_cache dan file statis.
+
+    - Paling banyak max_workers job berjalan bersamaan, max_queue job lain boleh menunggu
+    - Job berikutnya langsung ditolak dengan ExecutorSaturated (429 di API) alih-alih
+      menambah antrean yang tidak terbatas
+    - Setiap request memegang satu slot dengan reserve() (di API lewat dependency
+      search_slot/ingest_slot) selama semua pemanggilan call()-nya, misalnya selama
+      upload rekaman yang diproses per chunk
+    - spawn() menjalankan job background (misalnya refit model) yang memegang slot
+      sampai selesai
+    - stats() memberi metrik pemakaian executor
+
+    Kalau executor belum di-start, job berjalan langsung di thread pemanggil.
+
+    NumPy, PIL dan scipy melepas GIL pada operasi beratnya, jadi thread cukup dan model
+    yang sudah di-load di memori bisa dipakai langsung tanpa pickling.
+
+    Contoh:
+    ```python
+    search_executor = BoundedExecutor("search", max_workers=2, max_queue=8)
+    search_executor.start()
+    with search_executor.reserve():
+        pca = await search_executor.call(store.get, image_dir, 100, 100)
+        result = await search_executor.call(pca.findSimilarImages, query_img, None, 10)
+    print(search_executor.stats())
+    search_executor.shutdown()
+    ```
+    """
+
+    def __init__(self, name, max_workers=1, max_queue=4, retry_after=1):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.executor = None
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self.reset_stats()
+
+    def shutdown(self):
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @property
+    def running(self):
+        return self.executor is not None
+
+    def acquire(self):
+        with self.lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name, self.retry_after)
+            self.in_flight += 1
+            self.accepted += 1
+
+    def release(self, failed=False):
+        with self.lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    @contextmanager
+    def reserve(self):
+        """
+        Holds one of the max_workers + max_queue slots until the block exits,
+        raises ExecutorSaturated when none is free
+        """
+        self.acquire()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(failed)
+
+    def submit(self, fn, *args, **kwargs):
+        submitted = time.perf_counter()
+
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.wait_time += start - submitted
+                    self.busy_time += time.perf_counter() - start
+
+        return self.executor.submit(timed)
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        Runs fn in a worker thread; the caller holds a slot with reserve()
+
+        Returns:
+        fn(*args, **kwargs)
+        """
+        if self.executor is None:
+            return fn(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def spawn(self, fn, *args, **kwargs):
+        """
+        Starts fn in a worker thread without waiting for it, for background jobs. The job
+        holds a slot until it ends; raises ExecutorSaturated when none is free
+        """
+        if self.executor is None:
+            with self.reserve():
+                fn(*args, **kwargs)
+            return
+
+        self.acquire()
+        try:
+            future = self.submit(fn, *args, **kwargs)
+        except Exception:
+            self.release(failed=True)
+            raise
+        future.add_done_callback(lambda f: self.release(f.cancelled() or f.exception() is not None))
+
+    def stats(self):
+        """
+        Returns:
+        A dict of executor metrics; utilization is the time workers spent running jobs
+        divided by the worker time available since the executor started, wait_time is
+        the time accepted jobs spent queued before a worker picked them up
+        """
+        with self.lock:
+            uptime = time.time() - self.started_at
+            return {
+                "name": self.name,
+                "running": self.running,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "busy_time": round(self.busy_time, 3),
+                "wait_time": round(self.wait_time, 3),
+                "uptime": round(uptime, 3),
+                "utilization": round(self.busy_time / (self.max_workers * uptime), 4) if uptime > 0 else 0.0,
+            }
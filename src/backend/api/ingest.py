@@ -0,0 +1,164 @@
+import hashlib
+import os
+import zipfile
+
+from PIL import Image
+
+from api.ImagePCA import ImagePCA
+from api.catalog import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+class UploadIngestor:
+    """
+    Menyimpan file yang di-upload ke /uploaddata langsung ke direktori akhirnya,
+    per chunk (chunk_size byte), tanpa memuat seluruh file ke memori.
+
+    - Gambar dan MIDI ditulis ke image_dir / audio_dir, file lain ke upload_dir
+    - Zip dibaca entry per entry dan setiap gambar/MIDI di dalamnya langsung ditulis
+      ke direktori akhirnya, tanpa ekstrak ke upload_dir lalu memindai ulang direktori.
+      Path di dalam zip diabaikan (hanya nama file), entry lain dilewati.
+    - File ditulis ke <nama>.part lalu di-rename, jadi pembaca direktori tidak pernah
+      melihat file setengah jadi
+    - Gambar yang tidak bisa di-decode dihapus lagi dan tidak masuk new_images
+
+    Kalau image_store (ImageModelStore) diberikan, gambar langsung di-preprocess saat
+    entry lewat untuk setiap ukuran model yang sudah di-load, dan setiap flush_size gambar
+    dimasukkan ke model (ImageModelStore.ingest), jadi memori yang dipakai tetap terbatas
+    berapa pun besar zip-nya. Kalau audio_store (AudioFeatureStore) diberikan, MIDI di-hash
+    saat ditulis dan fiturnya langsung dihitung (AudioFeatureStore.ingest_file).
+
+    Contoh:
+    ```python
+    ingestor = UploadIngestor(upload_dir, image_dir, audio_dir, image_models, audio_features)
+    with open("dataset.zip", "rb") as f:
+        ingestor.add_upload("dataset.zip", f)
+    ingestor.finish()
+    ```
+    """
+
+    def __init__(self, upload_dir, image_dir, audio_dir, image_store=None, audio_store=None, chunk_size=UPLOAD_CHUNK_SIZE, flush_size=1024):
+        self.upload_dir = upload_dir
+        self.image_dir = image_dir
+        self.audio_dir = audio_dir
+        self.image_store = image_store
+        self.image_sizes = image_store.preprocessSizes() if image_store is not None else []
+        self.audio_store = audio_store
+        self.chunk_size = chunk_size
+        self.flush_size = flush_size
+        self.new_images = []
+        self.new_audio = []
+        # Images written since the last flush and their preprocessed rows per model size
+        self.pending_images = {}
+        self.preprocessed = {size: {} for size in self.image_sizes}
+
+    @staticmethod
+    def kind(name):
+        if name.endswith(IMAGE_EXTENSIONS):
+            return "image"
+        if name.endswith(AUDIO_EXTENSIONS):
+            return "audio"
+        return None
+
+    def add_upload(self, filename, fileobj):
+        """
+        Stores one uploaded file read from fileobj, a zip is unpacked entry by entry
+        """
+        name = os.path.basename(filename)
+        fileobj.seek(0)
+        if not name.endswith(".zip"):
+            self.write(self.kind(name), name, fileobj)
+            return
+
+        try:
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    entry = os.path.basename(info.filename)
+                    # Skip folders and the metadata files macOS adds to zips
+                    if info.is_dir() or info.filename.startswith("__MACOSX/") or entry.startswith("."):
+                        continue
+                    kind = self.kind(entry)
+                    if kind is not None:
+                        with archive.open(info) as src:
+                            self.write(kind, entry, src)
+        except zipfile.BadZipFile:
+            print(f"File {filename} bukan file zip yang valid.")
+
+    def write(self, kind, name, src):
+        directory = {"image": self.image_dir, "audio": self.audio_dir}.get(kind, self.upload_dir)
+        path = os.path.join(directory, name)
+        part_path = path + ".part"
+
+        # Images are decoded from memory afterwards, MIDI is hashed while it is written
+        chunks = [] if kind == "image" and self.image_store is not None else None
+        digest = hashlib.sha1() if kind == "audio" else None
+        with open(part_path, "wb") as f:
+            for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                f.write(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        os.replace(part_path, path)
+
+        if kind == "image":
+            if chunks is not None and self.image_sizes:
+                valid = self.preprocess(path, b"".join(chunks))
+            else:
+                valid = self.verify(path)
+            if not valid:
+                # An image no model can decode would break every later fit
+                os.remove(path)
+                return
+            self.new_images.append(path)
+            if chunks is not None:
+                self.pending_images[path] = None
+                if len(self.pending_images) >= self.flush_size:
+                    self.flush()
+        elif kind == "audio":
+            self.new_audio.append(path)
+            if self.audio_store is not None:
+                self.audio_store.ingest_file(path, digest.hexdigest())
+
+    @staticmethod
+    def verify(path):
+        """
+        Returns:
+        False when PIL cannot identify the image at path (only the header is parsed)
+        """
+        try:
+            with Image.open(path) as img:
+                img.verify()
+        except (OSError, ValueError) as e:
+            print(f"Skipping image {path}, failed to decode: {e}")
+            return False
+        return True
+
+    def preprocess(self, path, data):
+        """
+        Returns:
+        False when the image cannot be decoded, its rows are dropped again
+        """
+        try:
+            for width, height in self.image_sizes:
+                self.preprocessed[(width, height)][path] = ImagePCA.preprocessImageBytes(data, width, height)
+        except (OSError, ValueError) as e:
+            print(f"Skipping image {path}, failed to decode: {e}")
+            for rows in self.preprocessed.values():
+                rows.pop(path, None)
+            return False
+        return True
+
+    def flush(self):
+        """
+        Folds the images written since the last flush into the image models
+        """
+        if self.pending_images:
+            self.image_store.ingest(self.image_dir, list(self.pending_images), self.preprocessed)
+        self.pending_images = {}
+        self.preprocessed = {size: {} for size in self.image_sizes}
+
+    def finish(self):
+        if self.image_store is not None:
+            self.flush()
@@ -1,25 +1,111 @@
+import asyncio
 import json
 import time
-from fastapi import FastAPI, UploadFile, Query
+from fastapi import FastAPI, UploadFile, Query, HTTPException, Request, Response, Depends
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import os
-import zipfile
 import shutil
 from PIL import Image
-from typing import List
+from typing import List, Optional
 from io import BytesIO
+from contextlib import asynccontextmanager
 import copy
+import secrets
 from midiutil import MIDIFile
 import numpy as np
 
-from api.ImagePCA import ImagePCA
-from api.audio import get_similar_audio
+from api.ImageModelStore import ImageModelStore
+from api.audio import get_similar_audio, get_similar_notes, ALIGNMENTS
+from api.audio_store import AudioFeatureStore
+from api.audio_pool import AudioWorkerPool
+from api.recording import RecordingTranscriber, PCM_FORMATS
+from api.executor import BoundedExecutor, ExecutorSaturated
+from api.result_store import ResultStore
+from api.query_cache import QueryCache
+from api.catalog import UploadCatalog
+from api.ingest import UploadIngestor
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
+
+K_COMPONENTS = 10
+# Cascade search: (width, height, k_components) of the coarse model and its shortlist size
+CASCADE_COARSE_MODEL = (32, 32, 8)
+CASCADE_SHORTLIST = 200
+# Audio search: number of files shortlisted by the n-gram index for exact scoring. Used by
+# default only from AUDIO_SHORTLIST_MIN_FILES files on, below that scoring every file is about
+# as fast (benchmarks/bench_audio_ngram.py) and finds every match
+AUDIO_SHORTLIST = 100
+AUDIO_SHORTLIST_MIN_FILES = 2000
+# Recordings have no tempo, their seconds are converted to beats at this tempo (bpm)
+RECORDING_TEMPO = 120.0
+# CPU-bound work runs off the event loop: (workers, queued jobs) before new requests get a 429
+SEARCH_CONCURRENCY = (2, 8)
+INGEST_CONCURRENCY = (1, 2)
+# Search results kept for /get_cache: at most this many result sets, each expires after RESULT_TTL seconds unused
+RESULT_STORE_SIZE = 64
+RESULT_TTL = 30 * 60
+SESSION_COOKIE = "session_id"
+# Rankings of repeated queries (same file bytes and parameters) kept until the dataset changes:
+# at most this many rankings holding at most this many items in total
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_ITEMS = 1_000_000
+
+# Shared by all requests for MIDI feature extraction, started and stopped with the app
+audio_pool = AudioWorkerPool()
+audio_features = AudioFeatureStore(os.path.join(MODEL_DIR, "audio"), pool=audio_pool)
+search_executor = BoundedExecutor("search", *SEARCH_CONCURRENCY)
+ingest_executor = BoundedExecutor("ingest", *INGEST_CONCURRENCY)
+# Background refits of drifted models run on the ingest executor
+image_models = ImageModelStore(MODEL_DIR, drift_threshold=0.1, executor=ingest_executor)
+search_results = ResultStore(RESULT_STORE_SIZE, RESULT_TTL)
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_ITEMS)
+# Uploads and /delete_data write to the same directories, one at a time
+dataset_lock = asyncio.Lock()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reload fitted models from disk so the first query does not refit
+    image_models.load()
+    audio_features.load()
+    catalog.load(os.path.join(UPLOAD_DIR, "audio"), os.path.join(UPLOAD_DIR, "images"))
+    audio_pool.start()
+    search_executor.start()
+    ingest_executor.start()
+    yield
+    search_executor.shutdown()
+    ingest_executor.shutdown()
+    audio_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Dependencies holding an executor slot for the whole request, rejected with 429 when full
+async def search_slot():
+    with search_executor.reserve():
+        yield
+
+async def ingest_slot():
+    with ingest_executor.reserve():
+        yield
 
-app = FastAPI()
+# The session cookie ties a browser to its own search results
+def session_id(request: Request, response: Response):
+    session = request.cookies.get(SESSION_COOKIE)
+    if session is None:
+        session = secrets.token_urlsafe(16)
+        response.set_cookie(SESSION_COOKIE, session, httponly=True, samesite="lax")
+    return session
 
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
@@ -38,8 +124,8 @@ class PaginatedResponse(BaseModel):
     size: int
 
 mapper = {}
-cache = []
-time_cache = {}
+# Uploaded files for /get_uploads, searchable by file name and mapper title
+catalog = UploadCatalog(title_of=lambda name: mapper.get(name + "_name"))
 
 @app.post("/upload_mapper")
 async def upload_mapper(mapper_file: UploadFile):
@@ -61,6 +147,8 @@ async def upload_mapper(mapper_file: UploadFile):
                     mapper[entry["audio_file"] + "_name"] = entry["name"]
                     mapper[entry["pic_name"] + "_name"] = entry["name"]
     
+    catalog.refresh(name for entry in data for name in (entry.get("audio_file"), entry.get("pic_name")) if name)
+    query_cache.invalidate()
     return {"message": "Mapper uploaded"}
 
 @app.get("/get_uploads", response_model=PaginatedResponse)
@@ -69,48 +157,33 @@ def get_uploaded_files(
         size: int = Query(10, gt=0),
         search: str = Query("")
     ):
-    audio_dir = os.path.join(UPLOAD_DIR, "audio")
-    image_dir = os.path.join(UPLOAD_DIR, "images")
-    
-    image_files = [f for f in os.listdir(image_dir) if f.endswith((".jpg", ".jpeg", ".png"))]
-    audio_files = [f for f in os.listdir(audio_dir) if f.endswith((".mid"))]
-    
-    if search:
-        filtered_audio = [file for file in audio_files if search.lower() in file.lower()]
-        filtered_images = [file for file in image_files if search.lower() in file.lower()]
-    else:
-        filtered_audio = audio_files
-        filtered_images = image_files
-
-    files = []
-    
-    for idx, audio_file in enumerate(filtered_audio):
-        name = mapper.get(audio_file + "_name", None)
-        related_image = mapper.get(audio_file, None)
-        
-        files.append({
-            "id": idx,
-            "display": audio_file,
-            "title": name if name else audio_file,
-            "image": f"/api/uploads/images/{related_image}" if related_image else "/placeholder.png",
-            "audio": f"/api/uploads/audio/{audio_file}"
-        })
-    
-    for idx, image_file in enumerate(filtered_images):
-        related_audio = mapper.get(image_file, None)
-        
-        files.append({
-            "id": idx + len(filtered_audio),
-            "display": image_file,
-            "title": image_file,
-            "image": f"/api/uploads/images/{image_file}",
-            "audio": f"/api/uploads/audio/{related_audio}" if related_audio else "/midi/placeholder.mid"
-        })
-
+    # The catalog keeps the files sorted and indexed, only the page is built
+    entries, total = catalog.page(page, size, search)
     start = (page - 1) * size
-    end = start + size
-    items = files[start:end]
-    total = len(filtered_audio) + len(filtered_images)
+
+    items = []
+    for idx, (kind, file) in enumerate(entries, start=start):
+        if kind == "audio":
+            name = mapper.get(file + "_name", None)
+            related_image = mapper.get(file, None)
+
+            items.append({
+                "id": idx,
+                "display": file,
+                "title": name if name else file,
+                "image": f"/api/uploads/images/{related_image}" if related_image else "/placeholder.png",
+                "audio": f"/api/uploads/audio/{file}"
+            })
+        else:
+            related_audio = mapper.get(file, None)
+
+            items.append({
+                "id": idx,
+                "display": file,
+                "title": file,
+                "image": f"/api/uploads/images/{file}",
+                "audio": f"/api/uploads/audio/{related_audio}" if related_audio else "/midi/placeholder.mid"
+            })
 
     return PaginatedResponse(
         items=items,
@@ -120,7 +193,7 @@ def get_uploaded_files(
     )
 
 @app.post("/uploaddata")
-async def create_upload_file(file_uploads: List[UploadFile]):
+async def create_upload_file(file_uploads: List[UploadFile], inline: bool = Query(True), slot: None = Depends(ingest_slot)):
     audio_dir = os.path.join(UPLOAD_DIR, "audio")
     image_dir = os.path.join(UPLOAD_DIR, "images")
     query_dir = os.path.join(UPLOAD_DIR, "query")
@@ -130,86 +203,136 @@ async def create_upload_file(file_uploads: List[UploadFile]):
     os.makedirs(query_dir, exist_ok=True)
 
     filenames = []
-
-    # Process each uploaded file
-    for file in file_uploads:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        filenames.append(file.filename)
-
-        # Save the uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-            
-        # If the file is a zip, extract it
-        if file.filename.endswith(".zip"):
-            extract_zip(file_path, UPLOAD_DIR)
-
-            # After extraction, process extracted files
-            for root, dirs, files in os.walk(UPLOAD_DIR):
-                for extracted_file in files:
-                    extracted_file_path = os.path.join(root, extracted_file)
-
-                    if extracted_file.endswith((".png", ".jpg", ".jpeg")):
-                        shutil.move(extracted_file_path, os.path.join(image_dir, extracted_file))
-                    elif extracted_file.endswith(".mid"):
-                        shutil.move(extracted_file_path, os.path.join(audio_dir, extracted_file))
-
-            os.remove(file_path)
-
-        elif file.filename.endswith((".png", ".jpg", ".jpeg")):
-            shutil.move(file_path, os.path.join(image_dir, file.filename))
-        
-        elif file.filename.endswith(".mid"):
-            shutil.move(file_path, os.path.join(audio_dir, file.filename))
-
+    # Uploads are copied in chunks straight to their final directory, zips entry by entry.
+    # With inline, images are preprocessed for the loaded models and MIDI features computed
+    # as each file passes through, otherwise both happen in one batch after the upload
+    if inline:
+        ingestor = UploadIngestor(UPLOAD_DIR, image_dir, audio_dir, image_models, audio_features)
+    else:
+        ingestor = UploadIngestor(UPLOAD_DIR, image_dir, audio_dir)
+
+    # One upload or deletion at a time; queries keep using the loaded image models until
+    # the upload is folded into them
+    async with dataset_lock:
+        with image_models.ingesting(image_dir):
+            # Process each uploaded file. The files written so far are registered even when a
+            # later one fails, so the catalog and caches keep matching the directories
+            try:
+                for file in file_uploads:
+                    filenames.append(file.filename)
+                    await ingest_executor.call(ingestor.add_upload, file.filename, file.file)
+                await ingest_executor.call(ingestor.finish)
+            finally:
+                new_images = ingestor.new_images
+                new_audio = ingestor.new_audio
+
+                if new_images:
+                    image_models.invalidateFingerprints()
+                for path in new_images:
+                    catalog.add("image", os.path.basename(path))
+                for path in new_audio:
+                    catalog.add("audio", os.path.basename(path))
+
+                # Cached rankings are stale once the files are in place, and again after the
+                # models are updated in place below
+                query_cache.invalidate()
+
+            # Fold the new images into the fitted PCA models instead of refitting (already done
+            # batch by batch when inline)
+            if new_images and not inline:
+                await ingest_executor.call(image_models.ingest, image_dir, sorted(set(new_images)))
+
+        # Featurize new MIDI files once, at ingestion (only indexes them when computed inline)
+        if new_audio:
+            await ingest_executor.call(audio_features.ingest, sorted(set(new_audio)))
+
+        query_cache.invalidate()
     return {"filenames": filenames}
 
 @app.post("/find_similar_images")
-async def find_similar_images(query_image: UploadFile, k: int = Query(10, gt=0)):
+async def find_similar_images(
+        query_image: UploadFile,
+        k: int = Query(10, gt=0),
+        method: str = Query("exact"),
+        nprobe: int = Query(8, gt=0),
+        eps: float = Query(0.0, ge=0),
+        shortlist: int = Query(CASCADE_SHORTLIST, gt=0),
+        slot: None = Depends(search_slot),
+        session: str = Depends(session_id)
+    ):
+    # method: "exact" ranks every image, "kdtree"/"ivf" use the index and "cascade" reranks
+    # a coarse shortlist with the full model; these return the top k
+    if method not in ("exact", "kdtree", "ivf", "cascade"):
+        raise HTTPException(status_code=400, detail=f"Unknown method: {method}")
+
     query_dir = os.path.join(UPLOAD_DIR, "query")
     
-    # Clear the contents of the query directory
-    for file in os.listdir(query_dir):
-        file_path = os.path.join(query_dir, file)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-    
-    # Save the uploaded query image
+    # Clear the contents of the query directory and save the uploaded query image
     query_image_path = os.path.join(query_dir, query_image.filename)
     content = await query_image.read()
-    with open(query_image_path, "wb") as f:
-        f.write(content)
+    await search_executor.call(replace_query_file, query_dir, query_image_path, content)
     
     image_dir = os.path.join(UPLOAD_DIR, "images")
     width = 100
     height = 100
     
-    # Load and preprocess images for PCA
-    preprocess_start = time.time()
-    prep_images, mean_array, image_files = ImagePCA.loadAndPreprocessData(image_dir, width, height)
-    preprocess_end = time.time()
-
-    if not image_files:
-        return {"notfound": 1}
-
-    # Initialize and fit the PCA model
-    fit_start = time.time()
-    pca = ImagePCA()
-    pca.fit(prep_images, mean_array)
-    fit_end = time.time()
-
-    # Process the query image
-    with Image.open(BytesIO(content)) as img:
-        query_img = pca.preprocessQueryImage(img, width, height)
-        
-    # Find similar images
-    query_start = time.time()
-    similar_images = pca.findSimilarImages(query_img, prep_images, len(image_files))
-    query_end = time.time()
+    if method == "cascade":
+        fit_start = time.time()
+        cascade = await search_executor.call(image_models.getCascade, image_dir, CASCADE_COARSE_MODEL, (width, height, K_COMPONENTS))
+        fit_end = time.time()
+
+        if cascade is None:
+            return {"notfound": 1}
+        image_files = cascade.filenames
+
+        query_key = query_cache.key("image", content, query_cache.model_token(cascade), method, k, shortlist)
+        similar_images = query_cache.get(query_key)
+        cached = similar_images is not None
+
+        # The query is decoded once per model
+        preprocess_start = time.time()
+        if not cached:
+            coarse_query, fine_query = await search_executor.call(cascade.preprocessQueryImage, content)
+        preprocess_end = time.time()
+
+        query_start = time.time()
+        if not cached:
+            similar_images = await search_executor.call(cascade.findSimilarQuery, coarse_query, fine_query, k, shortlist)
+            query_cache.put(query_key, similar_images)
+        query_end = time.time()
+    else:
+        # Get the PCA model, only refits when the images have changed
+        fit_start = time.time()
+        pca = await search_executor.call(image_models.get, image_dir, width, height, K_COMPONENTS)
+        fit_end = time.time()
+
+        if pca is None:
+            return {"notfound": 1}
+        image_files = pca.filenames
+
+        # A repeated query against the same model reuses its ranking
+        query_key = query_cache.key("image", content, query_cache.model_token(pca), method, k, nprobe, eps)
+        similar_images = query_cache.get(query_key)
+        cached = similar_images is not None
+
+        # Process the query image
+        preprocess_start = time.time()
+        if not cached:
+            query_img = await search_executor.call(preprocess_query_image, pca, content, width, height)
+        preprocess_end = time.time()
+            
+        # Find similar images
+        query_start = time.time()
+        if not cached:
+            if method == "exact":
+                similar_images = await search_executor.call(pca.findSimilarImages, query_img, None, len(image_files))
+            else:
+                similar_images = await search_executor.call(pca.findSimilarImages, query_img, None, k, method=method, nprobe=nprobe, eps=eps)
+            query_cache.put(query_key, similar_images)
+        query_end = time.time()
 
-    # Update cache with image results
-    cache[:] = [
+    # Store the image results for /get_cache
+    items = [
         {
             "display": f"{sim * 100:.2f}%",
             "title": mapper.get(image_files[idx] + "_name", image_files[idx]),
@@ -221,75 +344,242 @@ async def find_similar_images(query_image: UploadFile, k: int = Query(10, gt=0))
         for idx, dist, sim in similar_images
     ]
     
-    time_cache["preprocess"] = f"{(preprocess_end - preprocess_start) * 1000:.2f}"
-    time_cache["fit"] = f"{(fit_end - fit_start) * 1000:.2f}"
-    time_cache["query"] = f"{(query_end - query_start) * 1000:.2f}"
-    time_cache["time"] = None
+    timings = {
+        "preprocess": f"{(preprocess_end - preprocess_start) * 1000:.2f}",
+        "fit": f"{(fit_end - fit_start) * 1000:.2f}",
+        "query": f"{(query_end - query_start) * 1000:.2f}",
+        "time": None,
+    }
+    result_id = search_results.put(items, timings, session)
     
     return {
+        "result_id": result_id,
+        "preprocess": timings["preprocess"],
+        "fit": timings["fit"],
+        "query": timings["query"],
+        "cached": cached,
+    }
+
+@app.post("/find_similar_images_batch")
+async def find_similar_images_batch(query_images: List[UploadFile], k: int = Query(10, gt=0), slot: None = Depends(search_slot)):
+    image_dir = os.path.join(UPLOAD_DIR, "images")
+    width = 100
+    height = 100
+
+    contents = [await query_image.read() for query_image in query_images]
+
+    fit_start = time.time()
+    pca = await search_executor.call(image_models.get, image_dir, width, height, K_COMPONENTS)
+    fit_end = time.time()
+
+    if pca is None:
+        return {"notfound": 1}
+    image_files = pca.filenames
+
+    # Decode all query images in parallel into one Q x D matrix
+    preprocess_start = time.time()
+    queries = await search_executor.call(pca.preprocessQueryImages, contents, width, height)
+    preprocess_end = time.time()
+
+    query_start = time.time()
+    similar_images = await search_executor.call(pca.findSimilarImagesBatch, queries, k)
+    query_end = time.time()
+
+    results = [
+        {
+            "query": query_image.filename,
+            "items": [
+                {
+                    "display": f"{sim * 100:.2f}%",
+                    "title": mapper.get(image_files[idx] + "_name", image_files[idx]),
+                    "sim": sim,
+                    "dist": dist,
+                    "image": image_files[idx],
+                    "audio": mapper.get(image_files[idx], None),
+                }
+                for idx, dist, sim in matches
+            ],
+        }
+        for query_image, matches in zip(query_images, similar_images)
+    ]
+
+    return {
+        "results": results,
         "preprocess": f"{(preprocess_end - preprocess_start) * 1000:.2f}",
         "fit": f"{(fit_end - fit_start) * 1000:.2f}",
         "query": f"{(query_end - query_start) * 1000:.2f}",
     }
 
+def store_audio_results(similar_midi, elapsed, session):
+    """
+    Returns:
+    The result_id of the MIDI results, stored for /get_cache
+    """
+    items = [
+        {
+            "display": f"{similarity:.2f}%",
+            "title": mapper.get(midi_file + "_name", midi_file),
+            "sim": similarity,
+            "audio": midi_file, 
+            "image": mapper.get(midi_file, None),
+            "offset": offset[0] if offset else None,
+        }
+        for midi_file, similarity, *offset in similar_midi
+    ]
+    
+    timings = {
+        "preprocess": None,
+        "fit": None,
+        "query": None,
+        "time": f"{elapsed * 1000:.2f}",
+    }
+    return search_results.put(items, timings, session)
+
+def shortlist_params(shortlist):
+    """
+    Returns:
+    The shortlist arguments of get_similar_notes: the requested shortlist as is, or
+    AUDIO_SHORTLIST from AUDIO_SHORTLIST_MIN_FILES files on when it was omitted
+    """
+    if shortlist is None:
+        return {"shortlist": AUDIO_SHORTLIST, "shortlist_min_files": AUDIO_SHORTLIST_MIN_FILES}
+    return {"shortlist": shortlist, "shortlist_min_files": 0}
+
 @app.post("/find_similar_audio")
-async def find_similar_audio(query_audio: UploadFile):
+async def find_similar_audio(
+        query_audio: UploadFile,
+        alignment: str = Query("start"),
+        shortlist: Optional[int] = Query(None, ge=0),
+        k: Optional[int] = Query(None, gt=0),
+        early_stop: bool = Query(False),
+        slot: None = Depends(search_slot),
+        session: str = Depends(session_id)
+    ):
+    # alignment: "start" compares both files from their first window, "all" finds the
+    # best offset of the query inside every file (for snippets from the middle of a song).
+    # k keeps only the k most similar files (all when omitted), early_stop skips files
+    # whose score cannot reach the top k. shortlist 0 scores every file, when omitted the
+    # default shortlist is used on large databases (see shortlist_params)
+    if alignment not in ALIGNMENTS:
+        raise HTTPException(status_code=400, detail=f"Unknown alignment: {alignment}")
+
     query_dir = os.path.join(UPLOAD_DIR, "query")
     search_directory = os.path.join(os.path.dirname(__file__), "uploads/audio")
 
     os.makedirs(query_dir, exist_ok=True)
 
     query_audio_path = os.path.join(query_dir, query_audio.filename)
-    with open(query_audio_path, "wb") as f:
-        content = await query_audio.read()
-        f.write(content)
+    content = await query_audio.read()
+    await search_executor.call(write_file, query_audio_path, content)
         
     if not os.listdir(search_directory):
         return {"notfound": 1}
 
     time_start = time.time()
-    similar_midi = get_similar_audio(query_audio_path, search_directory)
+    # MIDI files changed on disk outside /uploaddata change the fingerprint and miss the cache
+    dataset = await search_executor.call(AudioFeatureStore.fingerprint, search_directory)
+    query_key = query_cache.key("audio", content, dataset, alignment, shortlist, k, early_stop)
+    similar_midi = query_cache.get(query_key)
+    cached = similar_midi is not None
+    if not cached:
+        similar_midi = await search_executor.call(get_similar_audio, query_audio_path, search_directory, audio_features, pool=audio_pool, alignment=alignment, **shortlist_params(shortlist), k=k, early_stop=early_stop)
+        query_cache.put(query_key, similar_midi)
     time_end = time.time()
 
-    # Update cache with MIDI results
-    cache[:] = [
-        {
-            "display": f"{similarity:.2f}%",
-            "title": mapper.get(midi_file + "_name", midi_file),
-            "sim": similarity,
-            "audio": midi_file, 
-            "image": mapper.get(midi_file, None),
-        }
-        for midi_file, similarity in similar_midi
-    ]
-    
-    time_cache["preprocess"] = None
-    time_cache["fit"] = None
-    time_cache["query"] = None
-    time_cache["time"] = f"{(time_end - time_start) * 1000:.2f}"
+    result_id = store_audio_results(similar_midi, time_end - time_start, session)
+
+    return {"result_id": result_id, "time": f"{(time_end - time_start) * 1000:.2f} ms", "cached": cached}
+
+@app.post("/find_similar_recording")
+async def find_similar_recording(
+        request: Request,
+        sample_rate: Optional[int] = Query(None, gt=0),
+        channels: int = Query(1, gt=0),
+        sample_format: str = Query("s16le"),
+        tempo: float = Query(RECORDING_TEMPO, gt=0),
+        alignment: str = Query("all"),
+        shortlist: Optional[int] = Query(None, ge=0),
+        k: Optional[int] = Query(None, gt=0),
+        slot: None = Depends(search_slot),
+        session: str = Depends(session_id)
+    ):
+    # The body is the recording itself (WAV, or raw PCM described by sample_rate, channels
+    # and sample_format), sent in chunks. Pitch tracking runs while the chunks arrive so
+    # only the search is left when the upload finishes. A recording is usually a part of
+    # a song, so every offset is tried by default
+    if alignment not in ALIGNMENTS:
+        raise HTTPException(status_code=400, detail=f"Unknown alignment: {alignment}")
+    if sample_format not in PCM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown sample format: {sample_format}")
+
+    search_directory = os.path.join(UPLOAD_DIR, "audio")
+    transcriber = RecordingTranscriber(sample_rate, channels, sample_format, tempo)
+    transcribe_time = 0.0
+    try:
+        async for chunk in request.stream():
+            chunk_start = time.time()
+            await search_executor.call(transcriber.feed, chunk)
+            transcribe_time += time.time() - chunk_start
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pitches, beats = transcriber.finish()
+
+    if not os.path.isdir(search_directory) or not os.listdir(search_directory):
+        return {"notfound": 1}
+
+    time_start = time.time()
+    similar_midi = await search_executor.call(get_similar_notes, pitches, beats, search_directory, audio_features, pool=audio_pool, alignment=alignment, **shortlist_params(shortlist), k=k)
+    time_end = time.time()
+
+    result_id = store_audio_results(similar_midi, time_end - time_start, session)
+
+    return {
+        "result_id": result_id,
+        "time": f"{(time_end - time_start) * 1000:.2f} ms",
+        "transcribe": f"{transcribe_time * 1000:.2f} ms",
+        "notes": len(pitches),
+    }
 
-    return {"time": f"{(time_end - time_start) * 1000:.2f} ms"}
+@app.get("/get_audio_pool_stats")
+async def get_audio_pool_stats():
+    return audio_pool.stats()
+
+@app.get("/get_query_cache_stats")
+async def get_query_cache_stats():
+    return query_cache.stats()
+
+@app.get("/get_executor_stats")
+async def get_executor_stats():
+    return {"search": search_executor.stats(), "ingest": ingest_executor.stats()}
+
+def find_results(request, result_id):
+    """
+    Returns:
+    The ResultSet of result_id, else the last one of the session cookie; clients
+    without a cookie get the last search of anyone, like the old global cache
+    """
+    if result_id is not None:
+        results = search_results.get(result_id)
+        if results is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired result: {result_id}")
+        return results
+    return search_results.latest(request.cookies.get(SESSION_COOKIE))
 
 @app.get("/get_cache", response_model=PaginatedResponse)
 async def get_cache(
+        request: Request,
         page: int = Query(1, gt=0), 
         size: int = Query(10, gt=0),
-        search: str = Query("")
+        search: str = Query(""),
+        result_id: Optional[str] = Query(None)
     ):
     
-    if not cache:
+    results = find_results(request, result_id)
+    if results is None:
         return get_uploaded_files(page=page, size=size, search=search)
     
-    if search:
-        filtered_cache = [
-            entry for entry in cache
-            if (search.lower() in entry["image"].lower() or search.lower() in entry["audio"].lower()) or search.lower() in entry["title"].lower()
-        ]
-    else:
-        filtered_cache = cache
-    
-    start = (page - 1) * size
-    end = start + size
+    # Only the requested page is built, the filtered positions are cached per search term
+    page_items, total = results.page(page, size, search)
     items = [
         {
             "id": idx,
@@ -299,23 +589,35 @@ async def get_cache(
             "audio": f"/api/uploads/audio/" + item["audio"] if item["audio"] != None else None,
             "sim": item["sim"],
             "dist": item["dist"] if "dist" in item else None,
+            "offset": item["offset"] if "offset" in item else None,
         }
-        for idx, item in enumerate(filtered_cache[start:end])
+        for idx, item in enumerate(page_items)
     ]
     
     return PaginatedResponse(
         items=items,
-        total=len(filtered_cache),
+        total=total,
         page=page,
         size=size,
     )
     
 @app.get("/get_time_cache")
-async def get_time_cache():
-    return time_cache
+async def get_time_cache(request: Request, result_id: Optional[str] = Query(None)):
+    results = find_results(request, result_id)
+    return results.timings if results is not None else {}
+
+@app.get("/get_result_store_stats")
+async def get_result_store_stats():
+    return search_results.stats()
 
 @app.delete("/delete_data")
-async def delete_data():
+async def delete_data(slot: None = Depends(ingest_slot)):
+    # Waits for a running upload, the deletion itself runs off the event loop
+    async with dataset_lock:
+        await ingest_executor.call(delete_uploads)
+    return {"message": "Data deleted"}
+
+def delete_uploads():
     exclude_files = {".gitkeep", ".gitignore"}
     
     for file in os.listdir(UPLOAD_DIR):
@@ -327,6 +629,12 @@ async def delete_data():
         elif os.path.isdir(file_path):
             shutil.rmtree(file_path)
             
+    image_models.clear()
+    audio_features.clear()
+    search_results.clear()
+    query_cache.invalidate()
+    catalog.clear()
+
     audio_dir = os.path.join(UPLOAD_DIR, "audio")
     image_dir = os.path.join(UPLOAD_DIR, "images")
     query_dir = os.path.join(UPLOAD_DIR, "query")
@@ -335,35 +643,17 @@ async def delete_data():
     os.makedirs(image_dir, exist_ok=True)
     os.makedirs(query_dir, exist_ok=True)
 
-    return {"message": "Data deleted"}
+def write_file(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
 
-def extract_zip(zip_file_path, extract_to_dir, file_to_extract=None):
-    """
-    Mengekstrak file .zip ke direktori tertentu.
-    Jika file_to_extract diberikan, hanya file tersebut yang akan diekstrak.
-    
-    Parameters:
-    zip_file_path (str): Path ke file .zip
-    extract_to_dir (str): Direktori tujuan untuk ekstraksi
-    file_to_extract (str, optional): Nama file dalam .zip yang ingin diekstrak. Jika None, semua file akan diekstrak.
-    """
-    # Memastikan direktori tujuan ada
-    if not os.path.exists(extract_to_dir):
-        os.makedirs(extract_to_dir)
+def replace_query_file(query_dir, query_path, content):
+    for file in os.listdir(query_dir):
+        file_path = os.path.join(query_dir, file)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+    write_file(query_path, content)
 
-    try:
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            if file_to_extract:
-                # Mengekstrak file tertentu jika file_to_extract diberikan
-                zip_ref.extract(file_to_extract, extract_to_dir)
-                print(f'File {file_to_extract} berhasil diekstrak ke {extract_to_dir}')
-            else:
-                # Mengekstrak semua file jika tidak ada file_to_extract
-                zip_ref.extractall(extract_to_dir)
-                print(f'File .zip berhasil diekstrak ke {extract_to_dir}')
-    except FileNotFoundError:
-        print(f"File {zip_file_path} tidak ditemukan.")
-    except zipfile.BadZipFile:
-        print(f"File {zip_file_path} bukan file zip yang valid.")
-    except Exception as e:
-        print(f"Terjadi kesalahan: {e}")
\ No newline at end of file
+def preprocess_query_image(pca, content, width, height):
+    with Image.open(BytesIO(content)) as img:
+        return pca.preprocessQueryImage(img, width, height)
@@ -0,0 +1,129 @@
+import struct
+
+import numpy as np
+from mido import MidiFile
+
+# Data bytes of channel messages by the high nibble of the status byte
+CHANNEL_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+
+# Read the note_on events of a MIDI file
+def read_midi_notes(midi_path):
+    """
+    Scans the track chunks of the Standard MIDI File directly instead of building
+    mido message objects, falls back to mido for files it does not handle
+    (SMPTE time division, system common messages in tracks, truncated chunks).
+
+    Returns:
+    (pitches, beats): int64 and float64 arrays of every note_on with velocity > 0,
+    tracks merged and sorted by absolute time (notes at the same time keep track order)
+    """
+    with open(midi_path, "rb") as f:
+        data = f.read()
+    try:
+        ticks, pitches, ticks_per_beat = parse_note_events(data)
+    except (ValueError, IndexError, struct.error):
+        ticks, pitches, ticks_per_beat = mido_note_events(midi_path)
+    return merge_note_events(ticks, pitches, ticks_per_beat)
+
+
+# Sort note events of all tracks on absolute time
+def merge_note_events(ticks, pitches, ticks_per_beat):
+    ticks = np.asarray(ticks, dtype=np.int64)
+    pitches = np.asarray(pitches, dtype=np.int64)
+    order = np.argsort(ticks, kind='stable')
+    return pitches[order], ticks[order] / ticks_per_beat
+
+
+# Decode note_on events from the bytes of a Standard MIDI File
+def parse_note_events(data):
+    """
+    Returns:
+    (ticks, pitches, ticks_per_beat) with the absolute tick and pitch of every
+    note_on with velocity > 0, track by track
+    """
+    if data[:4] != b"MThd":
+        raise ValueError("Not a Standard MIDI File")
+    header_size = struct.unpack(">I", data[4:8])[0]
+    _, n_tracks, division = struct.unpack(">HHH", data[8:14])
+    if division & 0x8000:
+        raise ValueError("SMPTE time division")
+
+    ticks = []
+    pitches = []
+    pos = 8 + header_size
+    for _ in range(n_tracks):
+        # Skip unknown chunks before the next track
+        while data[pos:pos + 4] != b"MTrk":
+            if pos + 8 > len(data):
+                raise ValueError("Missing track chunk")
+            pos += 8 + struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        end = pos + 8 + struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        if end > len(data):
+            raise ValueError("Truncated track chunk")
+
+        i = pos + 8
+        tick = 0
+        status = 0
+        while i < end:
+            # Delta time, variable length quantity
+            byte = data[i]
+            i += 1
+            delta = byte & 0x7F
+            while byte & 0x80:
+                byte = data[i]
+                i += 1
+                delta = (delta << 7) | (byte & 0x7F)
+            tick += delta
+
+            byte = data[i]
+            if byte >= 0xF0:
+                i += 1
+                end_of_track = False
+                if byte == 0xFF:
+                    # Meta event: type, length, data
+                    end_of_track = data[i] == 0x2F
+                    i += 1
+                elif byte not in (0xF0, 0xF7):
+                    raise ValueError("System common message in track")
+                # Meta and sysex events do not change running status
+                byte = data[i]
+                i += 1
+                length = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[i]
+                    i += 1
+                    length = (length << 7) | (byte & 0x7F)
+                i += length
+                if end_of_track:
+                    break
+                continue
+
+            if byte & 0x80:
+                status = byte
+                i += 1
+            elif not status:
+                raise ValueError("Running status without a status byte")
+
+            kind = status & 0xF0
+            if kind == 0x90 and data[i + 1] > 0:
+                ticks.append(tick)
+                pitches.append(data[i])
+            i += CHANNEL_DATA_BYTES[kind]
+        pos = end
+    return ticks, pitches, division
+
+
+# Fallback for files parse_note_events does not handle
+def mido_note_events(midi_path):
+    midi = MidiFile(midi_path)
+    ticks = []
+    pitches = []
+    for track in midi.tracks:
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            if msg.type == 'note_on' and msg.velocity > 0:
+                ticks.append(tick)
+                pitches.append(msg.note)
+    return ticks, pitches, midi.ticks_per_beat
@@ -0,0 +1,120 @@
+import hashlib
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Cache hasil ranking pencarian berdasarkan isi file query: kunci adalah hash byte
+    query, parameter pencarian, token model yang dipakai dan versi dataset. Query yang
+    sama (cover atau potongan MIDI yang sering dicari ulang) langsung mendapat ranking
+    yang sudah dihitung tanpa preprocessing dan scoring ulang.
+
+    - invalidate() menaikkan versi dataset dan mengosongkan cache; dipanggil setiap
+      kali dataset atau mapper berubah. Hasil yang selesai dihitung dengan versi lama
+      tidak disimpan.
+    - model_token() memberi nomor unik untuk setiap objek model (weakref), jadi model
+      yang di-refit di background tidak memakai ranking dari model sebelumnya
+    - Paling banyak max_entries ranking dan max_items item ranking (jumlah len() semua
+      ranking) disimpan (LRU); ranking exact berisi seluruh dataset, jadi jumlah item
+      yang membatasi memori. Ranking yang lebih besar dari max_items tidak disimpan.
+    - stats() memberi jumlah hit, miss dan hit rate
+
+    Contoh:
+    ```python
+    query_cache = QueryCache(max_entries=256, max_items=1_000_000)
+    key = query_cache.key("image", content, query_cache.model_token(pca), k)
+    ranking = query_cache.get(key)
+    if ranking is None:
+        ranking = pca.findSimilarImages(query_img, None, k)
+        query_cache.put(key, ranking)
+    ```
+    """
+
+    def __init__(self, max_entries=256, max_items=1_000_000):
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.items = 0
+        self.version = 0
+        self.tokens = weakref.WeakKeyDictionary()
+        self.next_token = itertools.count()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def digest(content):
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def model_token(self, model):
+        """
+        Returns:
+        A number identifying model for as long as it is alive, never reused
+        """
+        with self.lock:
+            token = self.tokens.get(model)
+            if token is None:
+                token = self.tokens[model] = next(self.next_token)
+            return token
+
+    def key(self, kind, content, *params):
+        """
+        Returns:
+        The cache key of a query: the current dataset version, kind, hash of the query
+        bytes and the search parameters (which have to be hashable)
+        """
+        return (self.version, kind, self.digest(content), params)
+
+    def get(self, key):
+        """
+        Returns:
+        The cached ranking of key, None on a miss
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            # The dataset changed while this ranking was computed
+            if key[0] != self.version or len(value) > self.max_items:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.items -= len(old)
+            self.entries[key] = value
+            self.items += len(value)
+            while len(self.entries) > self.max_entries or self.items > self.max_items:
+                _, evicted = self.entries.popitem(last=False)
+                self.items -= len(evicted)
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.invalidations += 1
+            self.entries.clear()
+            self.items = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "items": self.items,
+                "max_items": self.max_items,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,267 @@
+import struct
+
+import numpy as np
+
+# Sample formats of raw PCM uploads: numpy dtype and scale to [-1, 1]
+PCM_FORMATS = {
+    "s16le": ("<i2", 1 / 32768),
+    "s32le": ("<i4", 1 / 2147483648),
+    "f32le": ("<f4", 1.0),
+}
+
+
+class PcmStreamDecoder:
+    """
+    Mengubah byte rekaman (WAV atau PCM mentah) yang datang per chunk menjadi sampel
+    mono float32. Header WAV dibaca begitu chunk "data" ditemukan; chunk berikutnya
+    langsung di-decode, byte sisa dari sampel yang terpotong disimpan untuk chunk berikutnya.
+
+    Stream yang tidak diawali "RIFF" dianggap PCM mentah dengan sample_rate, channels
+    dan sample_format yang diberikan.
+
+    Contoh:
+    ```python
+    decoder = PcmStreamDecoder()
+    for chunk in chunks:
+        samples = decoder.feed(chunk)
+    print(decoder.sample_rate, len(samples))
+    ```
+    """
+
+    def __init__(self, sample_rate=None, channels=1, sample_format="s16le"):
+        if sample_format not in PCM_FORMATS:
+            raise ValueError(f'Unknown sample format: {sample_format}')
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype, self.scale = PCM_FORMATS[sample_format]
+        self.header = b""
+        self.pending = b""
+        self.remaining = None
+        self.started = False
+
+    def feed(self, data):
+        """
+        Returns:
+        The mono float32 samples decoded from data (empty while the WAV header is incomplete)
+        """
+        if not self.started:
+            self.header += data
+            data = self.parse_header()
+            if data is None:
+                return np.zeros(0, dtype=np.float32)
+
+        # Ignore chunks after the data chunk of a WAV file
+        if self.remaining is not None:
+            data = data[:self.remaining]
+            self.remaining -= len(data)
+
+        data = self.pending + data
+        frame_bytes = np.dtype(self.dtype).itemsize * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self.pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32) * self.scale
+        return samples.reshape(-1, self.channels).mean(axis=1)
+
+    def parse_header(self):
+        """
+        Returns:
+        The bytes after the header once it is complete, None while more bytes are needed
+        """
+        header = self.header
+        if len(header) < 12:
+            return None
+        if header[:4] != b"RIFF":
+            # Raw PCM
+            if not self.sample_rate:
+                raise ValueError("sample_rate is required for raw PCM")
+            self.started = True
+            return header
+        if header[8:12] != b"WAVE":
+            raise ValueError("Not a WAV file")
+
+        pos = 12
+        while pos + 8 <= len(header):
+            chunk_id = header[pos:pos + 4]
+            size = struct.unpack("<I", header[pos + 4:pos + 8])[0]
+            if chunk_id == b"data":
+                self.started = True
+                # Streaming recorders write 0 or 0xFFFFFFFF when the length is unknown
+                self.remaining = size if 0 < size < 0xFFFFFFFF else None
+                return header[pos + 8:]
+            if pos + 8 + size > len(header):
+                return None
+            if chunk_id == b"fmt ":
+                self.parse_format(header[pos + 8:pos + 8 + size])
+            pos += 8 + size + size % 2
+        return None
+
+    def parse_format(self, fmt):
+        audio_format, channels, sample_rate = struct.unpack("<HHI", fmt[:8])
+        bits = struct.unpack("<H", fmt[14:16])[0]
+        if audio_format == 0xFFFE and len(fmt) >= 26:
+            # WAVE_FORMAT_EXTENSIBLE: the format is the start of the sub format GUID
+            audio_format = struct.unpack("<H", fmt[24:26])[0]
+        if (audio_format, bits) == (1, 16):
+            sample_format = "s16le"
+        elif (audio_format, bits) == (1, 32):
+            sample_format = "s32le"
+        elif (audio_format, bits) == (3, 32):
+            sample_format = "f32le"
+        else:
+            raise ValueError(f'Unsupported WAV format {audio_format} with {bits} bits')
+        self.dtype, self.scale = PCM_FORMATS[sample_format]
+        self.channels = channels
+        self.sample_rate = sample_rate
+
+
+class PitchTracker:
+    """
+    Pitch tracking YIN per frame yang berjalan bertahap: sampel ditambahkan per chunk
+    dan setiap frame yang sudah lengkap langsung diproses (semua frame baru dari satu
+    chunk sekaligus dengan FFT), jadi tidak perlu menunggu rekaman selesai.
+
+    feed() mengembalikan pitch MIDI (bilangan bulat) setiap frame baru, -1 untuk frame
+    yang tidak bernada (sunyi atau tidak ada periode di bawah threshold).
+
+    Contoh:
+    ```python
+    tracker = PitchTracker(44100)
+    pitches = np.concatenate([tracker.feed(samples) for samples in chunks])
+    ```
+    """
+
+    def __init__(self, sample_rate, frame_size=2048, hop_size=512, fmin=65.0, fmax=1000.0, threshold=0.15, silence=0.01):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self.window = frame_size // 2
+        self.tau_min = max(2, int(sample_rate / fmax))
+        self.tau_max = min(self.window - 1, int(sample_rate / fmin) + 1)
+        self.threshold = threshold
+        self.silence = silence
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.n_frames = 0
+
+    def feed(self, samples):
+        """
+        Returns:
+        The MIDI pitch of every frame completed by samples (-1 when unvoiced)
+        """
+        self.buffer = np.concatenate((self.buffer, np.asarray(samples, dtype=np.float32)))
+        n_frames = 0 if len(self.buffer) < self.frame_size else 1 + (len(self.buffer) - self.frame_size) // self.hop_size
+        if n_frames == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        frames = np.lib.stride_tricks.sliding_window_view(self.buffer, self.frame_size)[::self.hop_size][:n_frames]
+        pitches = self.frame_pitches(frames)
+        # Keep the samples the next frame still needs
+        self.buffer = self.buffer[n_frames * self.hop_size:]
+        self.n_frames += n_frames
+        return pitches
+
+    def frame_pitches(self, frames):
+        W = self.window
+        taus = self.tau_max + 1
+        frames = frames.astype(np.float64)
+
+        # Difference function d(tau) = sum_j (x_j - x_{j+tau})^2 for j < W, via FFT
+        n_fft = 1 << int(np.ceil(np.log2(self.frame_size + W)))
+        spectrum = np.fft.rfft(frames, n_fft)
+        head = np.fft.rfft(frames[:, :W], n_fft)
+        correlation = np.fft.irfft(spectrum * np.conj(head), n_fft)[:, :taus]
+        squares = np.cumsum(frames ** 2, axis=1)
+        squares = np.concatenate((np.zeros((len(frames), 1)), squares), axis=1)
+        energy = squares[:, W:W + taus] - squares[:, :taus]
+        difference = squares[:, W:W + 1] + energy - 2 * correlation
+        difference[:, 0] = 0
+
+        # Cumulative mean normalized difference
+        cumulative = np.cumsum(difference[:, 1:], axis=1)
+        normalized = np.ones_like(difference)
+        normalized[:, 1:] = difference[:, 1:] * np.arange(1, taus) / np.maximum(cumulative, 1e-12)
+
+        # First tau under the threshold, then down to the bottom of that dip
+        below = normalized[:, self.tau_min:] < self.threshold
+        voiced = below.any(axis=1)
+        tau = self.tau_min + np.argmax(below, axis=1)
+        rows = np.arange(len(frames))
+        for _ in range(taus):
+            step = (tau + 1 < taus) & (normalized[rows, np.minimum(tau + 1, taus - 1)] < normalized[rows, tau])
+            if not step.any():
+                break
+            tau += step
+
+        # Parabolic interpolation around the minimum
+        left = normalized[rows, tau - 1]
+        right = normalized[rows, np.minimum(tau + 1, taus - 1)]
+        center = normalized[rows, tau]
+        denominator = left + right - 2 * center
+        shift = np.divide(left - right, 2 * denominator, out=np.zeros(len(frames)), where=np.abs(denominator) > 1e-12)
+        period = tau + np.clip(shift, -1, 1)
+
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        voiced &= rms >= self.silence
+        frequency = self.sample_rate / np.maximum(period, 1)
+        pitches = np.rint(69 + 12 * np.log2(frequency / 440)).astype(np.int64)
+        return np.where(voiced & (pitches >= 0) & (pitches < 128), pitches, -1)
+
+
+class RecordingTranscriber:
+    """
+    Mengubah rekaman yang di-upload per chunk menjadi representasi not (pitch, beat)
+    seperti read_midi_notes: chunk di-decode (PcmStreamDecoder), pitch tiap frame
+    dihitung saat chunk datang (PitchTracker), dan frame berurutan dengan pitch yang
+    sama digabung menjadi satu not. Not yang lebih pendek dari min_note_frames dibuang.
+    Waktu diubah ke beat dengan tempo (bpm).
+
+    Contoh:
+    ```python
+    transcriber = RecordingTranscriber(tempo=120)
+    async for chunk in request.stream():
+        transcriber.feed(chunk)
+    pitches, beats = transcriber.finish()
+    ```
+    """
+
+    def __init__(self, sample_rate=None, channels=1, sample_format="s16le", tempo=120.0, min_note_frames=3, **tracker_params):
+        self.decoder = PcmStreamDecoder(sample_rate, channels, sample_format)
+        self.tempo = tempo
+        self.min_note_frames = min_note_frames
+        self.tracker_params = tracker_params
+        self.tracker = None
+        self.notes = []
+        self.current_pitch = -1
+        self.current_start = 0
+        self.current_length = 0
+
+    def feed(self, data):
+        samples = self.decoder.feed(data)
+        if self.tracker is None:
+            if self.decoder.sample_rate is None:
+                return
+            self.tracker = PitchTracker(self.decoder.sample_rate, **self.tracker_params)
+        first_frame = self.tracker.n_frames
+        for i, pitch in enumerate(self.tracker.feed(samples).tolist(), start=first_frame):
+            if pitch == self.current_pitch:
+                self.current_length += 1
+                continue
+            self.close_note()
+            self.current_pitch, self.current_start, self.current_length = pitch, i, 1
+
+    def close_note(self):
+        if self.current_pitch >= 0 and self.current_length >= self.min_note_frames:
+            seconds = self.current_start * self.tracker.hop_size / self.tracker.sample_rate
+            self.notes.append((self.current_pitch, seconds * self.tempo / 60))
+
+    def finish(self):
+        """
+        Returns:
+        (pitches, beats) of the transcribed notes, like midi_reader.read_midi_notes
+        """
+        if self.tracker is not None:
+            self.close_note()
+        self.current_pitch, self.current_length = -1, 0
+        if not self.notes:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        pitches, beats = zip(*self.notes)
+        return np.array(pitches, dtype=np.int64), np.array(beats)
@@ -0,0 +1,157 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultSet:
+    """
+    Hasil satu pencarian (list item seperti yang ditampilkan /get_cache) beserta
+    waktu prosesnya. Kolom pencarian (image, audio dan title dalam huruf kecil)
+    dihitung sekali saat hasil disimpan, dan indeks hasil filter untuk setiap kata
+    pencarian disimpan (LRU, max_filters kata) supaya membuka halaman berikutnya
+    hanya mengambil potongan (O(size)) tanpa memindai ulang seluruh hasil.
+
+    Contoh:
+    ```python
+    results = ResultSet(items, {"time": "12.50"})
+    page_items, total = results.page(page=2, size=10, search="love")
+    ```
+    """
+
+    def __init__(self, items, timings, max_filters=16):
+        self.items = items
+        self.timings = timings
+        self.max_filters = max_filters
+        # "\0" cannot appear in a search term, so a match never spans two fields
+        self.search_column = [
+            "\0".join((item.get("image") or "", item.get("audio") or "", item.get("title") or "")).lower()
+            for item in items
+        ]
+        self.filters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def matches(self, search):
+        """
+        Returns:
+        Positions of the items whose image, audio or title contains search (case insensitive)
+        """
+        search = search.lower()
+        with self.lock:
+            if search in self.filters:
+                self.filters.move_to_end(search)
+                return self.filters[search]
+        matches = [i for i, key in enumerate(self.search_column) if search in key]
+        with self.lock:
+            self.filters[search] = matches
+            while len(self.filters) > self.max_filters:
+                self.filters.popitem(last=False)
+        return matches
+
+    def page(self, page, size, search=""):
+        """
+        Returns:
+        (items, total): the items of the page (1-based) and the number of items matching search
+        """
+        start = (page - 1) * size
+        if not search:
+            return self.items[start:start + size], len(self.items)
+        matches = self.matches(search)
+        return [self.items[i] for i in matches[start:start + size]], len(matches)
+
+
+class ResultStore:
+    """
+    Menyimpan ResultSet per result_id di memori, menggantikan satu list cache global
+    yang ditimpa setiap pencarian. Setiap sesi (cookie) mengingat result_id terakhirnya,
+    jadi pengguna yang mencari bersamaan tidak saling menimpa hasil.
+
+    Memori dibatasi: paling banyak max_entries hasil (yang paling lama tidak dipakai
+    dibuang lebih dulu), dan hasil yang tidak dibuka selama ttl detik kedaluwarsa.
+
+    Contoh:
+    ```python
+    store = ResultStore(max_entries=64, ttl=1800)
+    result_id = store.put(items, {"time": "12.50"}, session="abc")
+    results = store.get(result_id) or store.latest("abc")
+    ```
+    """
+
+    def __init__(self, max_entries=64, ttl=1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.sessions = OrderedDict()
+        self.last_id = None
+        self.lock = threading.Lock()
+
+    def put(self, items, timings, session=None):
+        """
+        Returns:
+        The result_id of the new ResultSet
+        """
+        results = ResultSet(items, timings)
+        result_id = secrets.token_urlsafe(12)
+        with self.lock:
+            self.evict_expired()
+            self.entries[result_id] = (results, time.monotonic() + self.ttl)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if session is not None:
+                self.sessions[session] = result_id
+                self.sessions.move_to_end(session)
+                while len(self.sessions) > self.max_entries:
+                    self.sessions.popitem(last=False)
+            self.last_id = result_id
+        return result_id
+
+    def get(self, result_id):
+        """
+        Returns:
+        The ResultSet of result_id, None when it is unknown, evicted or expired
+        """
+        with self.lock:
+            entry = self.entries.get(result_id)
+            if entry is None:
+                return None
+            results, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[result_id]
+                return None
+            # Reading a result keeps it alive
+            self.entries[result_id] = (results, time.monotonic() + self.ttl)
+            self.entries.move_to_end(result_id)
+            return results
+
+    def latest(self, session=None):
+        """
+        Returns:
+        The last ResultSet stored for session, or of any session when session is None
+        """
+        result_id = self.last_id if session is None else self.sessions.get(session)
+        return self.get(result_id) if result_id is not None else None
+
+    def evict_expired(self):
+        now = time.monotonic()
+        expired = [result_id for result_id, (_, expires_at) in self.entries.items() if expires_at <= now]
+        for result_id in expired:
+            del self.entries[result_id]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sessions.clear()
+            self.last_id = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "sessions": len(self.sessions),
+                "items": sum(len(results) for results, _ in self.entries.values()),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
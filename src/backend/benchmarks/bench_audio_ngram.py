@@ -0,0 +1,106 @@
+"""
+Benchmark recall dan latency shortlist IntervalNgramIndex vs pencarian exhaustive
+(semua file di-score).
+
+Database: file MIDI test dataset ditambah --synthetic lagu sintetis (random walk
+pitch). Query: awal setiap file dataset (alignment "start") dan potongan dari
+tengahnya (alignment "all"). recall@k = bagian top-k exhaustive yang juga ada di
+top-k hasil shortlist.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_audio_ngram
+    python -m benchmarks.bench_audio_ngram --synthetic 0 2000 --shortlist 25 100 --k 5
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from api.audio import (
+    extract_windows, interval_ngrams, pack_features, process_midi, score_packed,
+    score_packed_aligned, subset_packed, window_features,
+)
+from api.audio_index import IntervalNgramIndex
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test", "mydataset", "audio")
+
+
+def synthetic_windows(rng, n_notes=400):
+    # Setiap lagu punya distribusi interval sendiri supaya n-gram-nya berbeda
+    steps = np.arange(-7, 8)
+    p = rng.dirichlet(np.ones(len(steps)) * 0.3)
+    pitches = np.clip(60 + np.cumsum(rng.choice(steps, n_notes, p=p)), 0, 127)
+    durations = rng.choice([0.25, 0.5, 1.0], n_notes)
+    beats = np.cumsum(durations)
+    notes = np.column_stack((pitches, durations))
+    return extract_windows(notes, beats, beats[-1])
+
+
+def top_names(packed, scores, k):
+    order = np.argsort(-scores, kind='stable')[:k]
+    return [packed["names"][i] for i in order]
+
+
+def run_queries(packed, index, queries, shortlists, k, aligned):
+    score = (lambda p, q: score_packed_aligned(p, q)[0]) if aligned else score_packed
+    exhaustive = []
+    start = time.perf_counter()
+    for features, _ in queries:
+        exhaustive.append(set(top_names(packed, score(packed, features), k)))
+    rows = [("all", 1.0, (time.perf_counter() - start) / len(queries), len(packed["names"]))]
+
+    for shortlist in shortlists:
+        recall, scored = 0.0, 0
+        start = time.perf_counter()
+        for (features, ngrams), expected in zip(queries, exhaustive):
+            candidates = index.candidates(ngrams, shortlist)
+            subset = packed if candidates is None else subset_packed(packed, candidates)
+            found = top_names(subset, score(subset, features), k) if len(subset["names"]) else []
+            recall += len(expected & set(found)) / len(expected)
+            scored += len(subset["names"])
+        elapsed = (time.perf_counter() - start) / len(queries)
+        rows.append((shortlist, recall / len(queries), elapsed, scored / len(queries)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--synthetic", type=int, nargs="+", default=[0, 1000, 5000])
+    parser.add_argument("--shortlist", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--snippet-windows", type=int, default=8)
+    args = parser.parse_args()
+
+    dataset = []
+    for f in sorted(os.listdir(args.dataset)):
+        if f.endswith(".mid"):
+            windows = process_midi(os.path.join(args.dataset, f))
+            if windows:
+                dataset.append((f, windows))
+
+    start_queries = [(window_features(w), interval_ngrams(w)) for _, w in dataset]
+    snippets = [w[len(w) // 2:len(w) // 2 + args.snippet_windows] for _, w in dataset]
+    snippet_queries = [(window_features(w), interval_ngrams(w)) for w in snippets if w]
+
+    rng = np.random.default_rng(0)
+    synthetic = []
+    print(f"{'files':>7} {'query':>8} {'shortlist':>10} {'recall@k':>9} {'scored':>8} {'time (ms)':>10}")
+    for n_synthetic in args.synthetic:
+        while len(synthetic) < n_synthetic:
+            windows = synthetic_windows(rng)
+            synthetic.append((f"synthetic_{len(synthetic)}", window_features(windows), interval_ngrams(windows)))
+
+        database = [(f, window_features(w)) for f, w in dataset] + [(f, features) for f, features, _ in synthetic[:n_synthetic]]
+        ngram_sets = [interval_ngrams(w) for _, w in dataset] + [ngrams for _, _, ngrams in synthetic[:n_synthetic]]
+        packed = pack_features(database)
+        index = IntervalNgramIndex(ngram_sets)
+
+        for name, queries, aligned in (("start", start_queries, False), ("snippet", snippet_queries, True)):
+            for shortlist, recall, elapsed, scored in run_queries(packed, index, queries, args.shortlist, args.k, aligned):
+                print(f"{len(database):>7} {name:>8} {shortlist:>10} {recall:9.3f} {scored:8.0f} {elapsed * 1000:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark memory dan latency scoring MIDI dengan RTB/FTB sparse (CSR float32)
+vs dense, untuk score_packed (alignment "start") dan score_packed_aligned ("all").
+
+Fitur test dataset dihitung sekali lalu diperbanyak secara sintetis (--scale kali),
+setiap salinan ditransposisi acak supaya ATB-nya berbeda.
+Kolom "raw f64" adalah ukuran fitur dense float64 seperti yang dulu disimpan per window.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_audio_sparse
+    python -m benchmarks.bench_audio_sparse --dataset ../../test/mydataset/audio --scale 1 10 50
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from api.audio import (
+    compute_midi_features, pack_features, packed_nbytes, score_packed, score_packed_aligned,
+)
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test", "mydataset", "audio")
+
+
+def load_dataset(dataset):
+    db_features = []
+    for f in sorted(os.listdir(dataset)):
+        if f.endswith(".mid"):
+            features = compute_midi_features(os.path.join(dataset, f))
+            if features[0].shape[0]:
+                db_features.append((f, features))
+    return db_features
+
+
+def scale_dataset(db_features, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    scaled = []
+    for copy in range(scale):
+        for name, (atb, rtb, ftb) in db_features:
+            shift = int(rng.integers(-6, 7)) if copy else 0
+            scaled.append((f"{copy}_{name}", (np.roll(atb, shift, axis=1), rtb, ftb)))
+    return scaled
+
+
+def timeit(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--query-windows", type=int, default=8)
+    args = parser.parse_args()
+
+    db_features = load_dataset(args.dataset)
+    name, features = db_features[0]
+    # Potongan dari tengah file pertama sebagai query
+    query = tuple(f[5:5 + args.query_windows] for f in features)
+
+    print(f"{'files':>7} {'windows':>8} {'raw f64 (MB)':>13} {'dense (MB)':>11} {'sparse (MB)':>12} "
+          f"{'start dense':>12} {'start sparse':>13} {'all dense':>10} {'all sparse':>11} {'max diff':>9}")
+    for scale in args.scale:
+        scaled = scale_dataset(db_features, scale)
+        n_windows = sum(f[0].shape[0] for _, f in scaled)
+        raw = n_windows * (128 + 512 + 512) * 8
+
+        dense = pack_features(scaled, sparse=False)
+        sparse = pack_features(scaled, sparse=True)
+        diff = max(
+            np.abs(score_packed(dense, query) - score_packed(sparse, query)).max(),
+            np.abs(score_packed_aligned(dense, query)[0] - score_packed_aligned(sparse, query)[0]).max(),
+        )
+        times = [
+            timeit(lambda: score_packed(dense, query)),
+            timeit(lambda: score_packed(sparse, query)),
+            timeit(lambda: score_packed_aligned(dense, query)),
+            timeit(lambda: score_packed_aligned(sparse, query)),
+        ]
+        print(f"{len(scaled):>7} {n_windows:>8} {raw / 1e6:13.1f} {packed_nbytes(dense) / 1e6:11.1f} "
+              f"{packed_nbytes(sparse) / 1e6:12.1f} " + " ".join(f"{t * 1000:{w}.2f}" for t, w in zip(times, (12, 13, 10, 11)))
+              + f" {diff:9.1e}")
+        del dense, sparse
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark ImagePCA.fit solvers (arpack, randomized, gram) for different corpus sizes
+and image resolutions.
+
+Akurasi tiap solver dibandingkan dengan SVD exact (np.linalg.svd):
+- subspace: cosinus principal angle terkecil antara U solver dan U exact (1 = sama)
+- sv_err: error relatif maksimum singular value
+
+Data sintetis low-rank + noise supaya spektrumnya mirip data gambar.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_fit_solvers
+    python -m benchmarks.bench_fit_solvers --dataset ../../test/mydataset/pict
+"""
+import argparse
+import time
+
+import numpy as np
+
+from api.ImagePCA import ImagePCA
+
+
+def synthetic_images(N, D, rank=40, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, D)).astype(np.float32)
+    weights = rng.standard_normal((N, rank)).astype(np.float32) * np.linspace(50, 1, rank, dtype=np.float32)
+    X = weights @ basis + rng.standard_normal((N, D)).astype(np.float32) * 5
+    X += 128
+    mean_array = ImagePCA.standardizeInPlace(X)
+    return X, mean_array
+
+
+def exact_components(X, k_components):
+    N = X.shape[0]
+    U, S, _ = np.linalg.svd(X.T.astype(np.float64) / np.sqrt(N), full_matrices=False)
+    return U[:, :k_components], S[:k_components]
+
+
+def run(X, mean_array, k_components, solvers):
+    U_exact, S_exact = exact_components(X, k_components) if X.shape[0] * X.shape[1] <= 5e7 else (None, None)
+    for solver in solvers:
+        if solver == "gram" and X.shape[0] > 5000:
+            continue
+        pca = ImagePCA()
+        start = time.perf_counter()
+        pca.fit(X, mean_array, k_components, solver=solver)
+        elapsed = time.perf_counter() - start
+
+        if U_exact is not None:
+            subspace = ImagePCA.subspaceSimilarity(U_exact, pca.U.astype(np.float64)).min()
+            sv_err = np.max(np.abs(pca.S - S_exact) / S_exact)
+            accuracy = f"{subspace:10.6f} {sv_err:10.2e}"
+        else:
+            accuracy = f"{'-':>10} {'-':>10}"
+        ratio = pca.fit_info["explained_variance_ratio"]
+        print(f"{X.shape[0]:>8} {X.shape[1]:>7} {solver:>11} {elapsed * 1000:10.1f} {ratio:8.4f} {accuracy}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", help="Directory of images to use instead of synthetic data")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    solvers = ("arpack", "randomized", "gram")
+    print(f"{'N':>8} {'D':>7} {'solver':>11} {'time (ms)':>10} {'var':>8} {'subspace':>10} {'sv_err':>10}")
+    if args.dataset:
+        for size in (32, 64, 100):
+            X, mean_array, _ = ImagePCA.loadAndPreprocessData(args.dataset, size, size)
+            run(X, mean_array, args.k, solvers)
+        return
+
+    for N, side in ((500, 32), (500, 100), (2000, 100), (10000, 32), (10000, 100)):
+        X, mean_array = synthetic_images(N, side * side)
+        run(X, mean_array, args.k, solvers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark query latency of ImagePCA.findSimilarImages from 1k to 1M images.
+
+Memakai proyeksi sintetis (tanpa file gambar) supaya hanya jalur query yang diukur:
+proyeksi query (1 matmul), jarak euclidean ke semua gambar, dan top-k.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_image_query
+"""
+import time
+
+import numpy as np
+
+from api.ImagePCA import ImagePCA
+
+
+def loop_query(pca, query, k):
+    # Jalur lama: loop Python per gambar lalu sort seluruh list
+    query_Z = ImagePCA.projectToPrincipalComponents(query, pca.U)
+    distances = [(i, ImagePCA.euclideanDistance(query_Z, z)) for i, z in enumerate(pca.Z)]
+    distances.sort(key=lambda x: x[1])
+    return distances[:k]
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes=(1_000, 10_000, 100_000, 1_000_000), width=100, height=100, k_components=10, k=10):
+    rng = np.random.default_rng(0)
+    D = width * height
+    U, _ = np.linalg.qr(rng.standard_normal((D, k_components)))
+    query = rng.standard_normal(D).astype(np.float32)
+
+    print(f"{'N':>10} {'vectorized (ms)':>16} {'loop (ms)':>12}")
+    for N in sizes:
+        pca = ImagePCA()
+        pca.U = U
+        pca.X_mean_array = np.zeros(D, dtype=np.float32)
+        pca.setProjections(rng.standard_normal((N, k_components)) * 1000)
+        pca.fit_done = True
+
+        vectorized = timeit(lambda: pca.findSimilarImages(query, None, k), 5)
+        loop = timeit(lambda: loop_query(pca, query, k), 1) if N <= 100_000 else None
+        loop_str = f"{loop * 1000:12.2f}" if loop is not None else f"{'-':>12}"
+        print(f"{N:>10} {vectorized * 1000:16.2f} {loop_str}")
+
+
+if __name__ == "__main__":
+    main()
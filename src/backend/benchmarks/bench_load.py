@@ -0,0 +1,142 @@
+"""
+Load test API: beberapa client mengirim query gambar dan audio terus-menerus
+sementara satu client "probe" memanggil /get_uploads, untuk melihat apakah API
+tetap responsif saat pencarian berjalan.
+
+Secara default app dijalankan di proses yang sama (httpx ASGITransport, lifespan
+ikut dijalankan) memakai file di api/uploads. --inline tidak men-start
+search/ingest executor sehingga pencarian berjalan di event loop seperti sebelum
+ada executor, sebagai pembanding. --url mengirim request ke server yang sedang
+berjalan. Request yang ditolak executor (429) dihitung terpisah.
+
+Setiap request diberi byte tambahan yang unik di akhir file query (diabaikan decoder
+gambar dan MIDI), jadi query cache tidak pernah hit dan setiap request benar-benar
+dihitung. --repeat mengirim byte yang sama terus sehingga setelah warm-up semua
+request dilayani dari cache.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --inline
+    python -m benchmarks.bench_load --repeat
+    python -m benchmarks.bench_load --clients 8 --duration 20 --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+import httpx
+import numpy as np
+
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "api", "uploads")
+request_ids = itertools.count()
+
+
+def first_file(directory, extensions):
+    for f in sorted(os.listdir(directory)):
+        if f.endswith(extensions):
+            with open(os.path.join(directory, f), "rb") as data:
+                return f, data.read()
+    raise SystemExit(f"No {extensions} file in {directory}")
+
+
+def unique_files(files):
+    # Trailing bytes change the query cache key but not the decoded image or notes
+    suffix = f"\0{next(request_ids)}".encode()
+    return {field: (name, data + suffix) for field, (name, data) in files.items()}
+
+
+async def search_client(client, requests, deadline, counts, repeat):
+    i = 0
+    while time.perf_counter() < deadline:
+        url, params, files = requests[i % len(requests)]
+        i += 1
+        if not repeat:
+            files = unique_files(files)
+        response = await client.post(url, params=params, files=files)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 429:
+            await asyncio.sleep(0.05)
+
+
+async def probe_client(client, deadline, interval, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/get_uploads", params={"page": 1, "size": 10})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def run_load(client, args):
+    image = first_file(os.path.join(UPLOAD_DIR, "images"), (".png", ".jpg", ".jpeg"))
+    audio = first_file(os.path.join(UPLOAD_DIR, "audio"), (".mid",))
+    requests = [
+        ("/find_similar_images", {"method": "exact"}, {"query_image": image}),
+        ("/find_similar_images", {"method": "cascade"}, {"query_image": image}),
+        ("/find_similar_audio", {"alignment": "all", "shortlist": 0}, {"query_audio": audio}),
+    ]
+
+    # Warm up: fits the image models and featurizes the audio once
+    for url, params, files in requests:
+        (await client.post(url, params=params, files=files)).raise_for_status()
+
+    idle = []
+    await probe_client(client, time.perf_counter() + 1.0, args.interval, idle)
+
+    counts = {}
+    loaded = []
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(
+        probe_client(client, deadline, args.interval, loaded),
+        *(search_client(client, requests, deadline, counts, args.repeat) for _ in range(args.clients)),
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{'/get_uploads':>14} {'n':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'max (ms)':>9}")
+    for name, latencies in (("idle", idle), ("under load", loaded)):
+        ms = np.array(latencies) * 1000
+        print(f"{name:>14} {len(ms):>6} {np.percentile(ms, 50):9.2f} {np.percentile(ms, 95):9.2f} {ms.max():9.2f}")
+    searches = sum(n for status, n in counts.items() if status == 200)
+    print(f"searches: {searches} ok ({searches / elapsed:.1f}/s), {counts.get(429, 0)} rejected (429), statuses {counts}")
+
+    stats = await client.get("/get_executor_stats")
+    if stats.status_code == 200:
+        for name, executor in stats.json().items():
+            print(f"{name}: {executor}")
+    cache = await client.get("/get_query_cache_stats")
+    if cache.status_code == 200:
+        cache = cache.json()
+        print(f"query cache: {cache['hits']} hits, {cache['misses']} misses")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--inline", action="store_true")
+    parser.add_argument("--repeat", action="store_true")
+    parser.add_argument("--url")
+    args = parser.parse_args()
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            await run_load(client, args)
+        return
+
+    from api.main import app, search_executor, ingest_executor
+
+    async with app.router.lifespan_context(app):
+        if args.inline:
+            search_executor.shutdown()
+            ingest_executor.shutdown()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            await run_load(client, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Benchmark parse note MIDI: parser SMF langsung (midi_reader.parse_note_events)
+vs membangun mido.MidiFile, pada semua file test dataset.
+
+Kolom "same" memeriksa kedua parser menghasilkan event (tick, pitch) yang sama.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_midi_parse
+    python -m benchmarks.bench_midi_parse --dataset ../../test/mydataset/audio --repeat 5
+"""
+import argparse
+import os
+import time
+
+from api.midi_reader import mido_note_events, parse_note_events
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test", "mydataset", "audio")
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    total_fast = total_mido = 0.0
+    print(f"{'file':>40} {'KB':>6} {'notes':>7} {'mido (ms)':>10} {'direct (ms)':>12} {'same':>5}")
+    for f in sorted(os.listdir(args.dataset)):
+        if not f.endswith(".mid"):
+            continue
+        path = os.path.join(args.dataset, f)
+        with open(path, "rb") as midi_file:
+            data = midi_file.read()
+        try:
+            t_mido, (ticks, pitches, division) = timeit(lambda: mido_note_events(path), args.repeat)
+        except Exception as e:
+            print(f"Skipping {f}: {e}")
+            continue
+        t_fast, (fast_ticks, fast_pitches, fast_division) = timeit(lambda: parse_note_events(data), args.repeat)
+        same = division == fast_division and sorted(zip(ticks, pitches)) == sorted(zip(fast_ticks, fast_pitches))
+        total_fast += t_fast
+        total_mido += t_mido
+        print(f"{f[:40]:>40} {len(data) / 1024:6.0f} {len(pitches):>7} {t_mido * 1000:10.2f} {t_fast * 1000:12.2f} {str(same):>5}")
+    print(f"{'total':>40} {'':>6} {'':>7} {total_mido * 1000:10.2f} {total_fast * 1000:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
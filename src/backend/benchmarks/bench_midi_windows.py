@@ -0,0 +1,87 @@
+"""
+Micro-benchmark window extraction (audio.extract_windows) vs the old per-stride
+mask loop, on the longest MIDI files of the test dataset. Notes are read with
+read_midi_notes (all tracks merged) like process_midi does, and the "same" column
+checks both paths against the windows of process_midi.
+
+Jalankan dari src/backend:
+    python -m benchmarks.bench_midi_windows
+    python -m benchmarks.bench_midi_windows --dataset ../../test/mydataset/audio --top 5
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from api.audio import extract_windows, process_midi, read_midi_notes, WINDOW_SIZE_BEATS, STRIDE_BEATS
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "..", "..", "..", "test", "mydataset", "audio")
+
+
+def load_notes(midi_path):
+    # Same input that note_windows builds for process_midi: every track merged on absolute time
+    pitches, beats = read_midi_notes(midi_path)
+    beat_durations = np.diff(beats, prepend=0)
+    note_representation = np.column_stack((pitches, beat_durations))
+    return note_representation, np.cumsum(beat_durations), np.sum(beat_durations)
+
+
+def loop_windows(note_representation, cumsum_beat_durations, total_beats, window_size_beats, stride_beats):
+    # Jalur lama: mask boolean atas semua not untuk setiap stride
+    windows = []
+    start_beat = 0
+    while start_beat < total_beats:
+        mask = (cumsum_beat_durations > start_beat) & \
+               (cumsum_beat_durations <= start_beat + window_size_beats)
+        current_window = note_representation[mask]
+        if current_window.size > 0:
+            windows.append(current_window)
+        start_beat += stride_beats
+    return windows
+
+
+def timeit(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--window", type=float, default=WINDOW_SIZE_BEATS)
+    parser.add_argument("--stride", type=float, default=STRIDE_BEATS)
+    args = parser.parse_args()
+
+    parsed = []
+    for f in os.listdir(args.dataset):
+        if not f.endswith(".mid"):
+            continue
+        try:
+            parsed.append((load_notes(os.path.join(args.dataset, f)), f))
+        except Exception as e:
+            print(f"Skipping {f}: {e}")
+    parsed.sort(key=lambda x: len(x[0][0]), reverse=True)
+
+    print(f"{'file':>40} {'notes':>7} {'windows':>8} {'loop (ms)':>10} {'vectorized (ms)':>16} {'same':>5}")
+    for (rep, cum, total), path in parsed[:args.top]:
+        old = loop_windows(rep, cum, total, args.window, args.stride)
+        new = extract_windows(rep, cum, total, args.window, args.stride)
+        # Both paths have to match the windows process_midi produces
+        production = process_midi(os.path.join(args.dataset, path), args.window, args.stride)
+        same = all(
+            len(windows) == len(production) and all(np.array_equal(a, b) for a, b in zip(windows, production))
+            for windows in (old, new)
+        )
+        t_old = timeit(lambda: loop_windows(rep, cum, total, args.window, args.stride))
+        t_new = timeit(lambda: extract_windows(rep, cum, total, args.window, args.stride))
+        print(f"{path[:40]:>40} {len(rep):>7} {len(new):>8} {t_old * 1000:10.3f} {t_new * 1000:16.3f} {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()